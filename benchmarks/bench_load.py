@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: resolving asset folders with `YYProject.load_assets`.
+
+    python benchmarks/bench_load.py [--assets 10000] [--latency 0] [--workers 1 4 16]
+
+`--latency` adds a delay (in milliseconds) to every .yy read, to emulate
+network-mounted dependency directories.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import json5
+
+from gmdm import models
+from gmdm.models import YYProject
+
+SPRITE = """{
+  "$GMSprite":"",
+  "%%Name":"%(name)s",
+  "frames":[
+    {"$GMSpriteFrame":"","%%Name":"f0","name":"f0","resourceType":"GMSpriteFrame","resourceVersion":"2.0",},
+  ],
+  "name":"%(name)s",
+  "parent":{
+    "name":"Sprites",
+    "path":"folders/Sprites.yy",
+  },
+  "resourceType":"GMSprite",
+  "resourceVersion":"2.0",
+}"""
+
+
+def make_project(directory, count):
+    resources = []
+    for i in range(count):
+        name = f"spr_{i}"
+        os.makedirs(os.path.join(directory, "sprites", name))
+        with open(os.path.join(directory, "sprites", name, name + ".yy"), "w") as f:
+            f.write(SPRITE % {"name": name})
+        resources.append({"id": {"name": name, "path": f"sprites/{name}/{name}.yy"}})
+    data = {"Folders": [{"folderPath": "folders/Sprites.yy", "name": "Sprites"}],
+            "resources": resources}
+    path = os.path.join(directory, "Bench.yyp")
+    with open(path, "w") as f:
+        json5.dump(data, f, quote_keys=True, indent=2)
+    return path
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args(argv)
+
+    if args.latency:
+        read = models.read_yy_parent
+
+        def slow_read(path):
+            time.sleep(args.latency / 1000)
+            return read(path)
+        models.read_yy_parent = slow_read
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_project(directory, args.assets)
+        print(f"{args.assets} assets, {args.latency} ms latency per read")
+        for workers in args.workers:
+            project = YYProject(path)
+            start = time.perf_counter()
+            project.load_assets(workers=workers)
+            elapsed = time.perf_counter() - start
+            assert [a.path for a in project.resources] == \
+                [r["id"]["path"] for r in project._data["resources"]]
+            print(f"  workers={workers:<4}{elapsed:>8.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: memory of loaded dependency projects.
+
+    python benchmarks/bench_memory.py [--assets 30000] [--deps 3] [--cache]
+        [-o results.json] [--baseline old.json]
+
+Generates `--deps` projects (see `synthetic.py`) and loads them all, with
+their asset folders, in a fresh process. Reports the peak RSS of that
+process and its growth over the RSS before loading. Unix only.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from synthetic import folder_paths, make_project  # noqa: E402
+
+
+def rss_kib():
+    """Return the current RSS in KiB."""
+    with open("/proc/self/statm", "r", encoding="ascii") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def child(paths, cache_path):
+    from gmdm.cache import MetadataCache  # pylint: disable=C0415
+    from gmdm.models import YYProject  # pylint: disable=C0415
+
+    cache = MetadataCache(cache_path) if cache_path else None
+    before = rss_kib()
+    start = time.perf_counter()
+    projects = []
+    for path in paths:
+        project = YYProject(path, cache)
+        project.load_assets()
+        projects.append(project)
+    elapsed = time.perf_counter() - start
+    after = rss_kib()
+    print(json.dumps({
+        "rss_before_kib": before,
+        "rss_after_kib": after,
+        "rss_growth_kib": after - before,
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "load_seconds": elapsed,
+        "resources": sum(len(p.resources) for p in projects),
+    }))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=30000)
+    parser.add_argument("--deps", type=int, default=3)
+    parser.add_argument("--cache", action="store_true",
+                        help="load through a warm metadata cache")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare with")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.cache_path)
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for d in range(args.deps):
+            name = f"Dep{d}"
+            os.makedirs(os.path.join(directory, name))
+            paths.append(make_project(os.path.join(directory, name), name,
+                                      args.assets, folder_paths(name, 3), 1))
+        cmd = [sys.executable, __file__, "--child", *paths]
+        if args.cache:
+            cmd += ["--cache-path", os.path.join(directory, "cache.sqlite")]
+            # Fill the cache first.
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        result = json.loads(subprocess.run(
+            cmd, check=True, stdout=subprocess.PIPE, text=True).stdout)
+
+    result["params"] = {"assets": args.assets, "deps": args.deps, "cache": args.cache}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{args.deps} x {args.assets} assets, cache {'on' if args.cache else 'off'}")
+    for key in ("peak_rss_kib", "rss_growth_kib", "load_seconds"):
+        line = f"  {key:<16}{result[key]:>12.2f}" if key == "load_seconds" \
+            else f"  {key:<16}{result[key]:>12}"
+        if baseline is not None and baseline.get(key):
+            line += f"{baseline[key]:>12.2f}{result[key] / baseline[key]:>8.2f}x"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: parse/serialize time per MB of GameMaker JSON.
+
+Compares `json5` with `gmdm.utils.parsing` (stdlib `json` and, when
+installed, `orjson`).
+
+    python benchmarks/bench_parse.py [file.yyp | file.yy ...]
+
+Without arguments a .yyp with 20000 resources and a 200 frame sprite are
+generated.
+"""
+import os
+import sys
+import time
+
+import json5
+
+from gmdm.utils import parsing
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_yy_parent import SPRITE_2023, SPRITE_2023_FRAME, sprite  # noqa: E402
+
+
+def sample_yyp(count):
+    folders = [{"$GMFolder": "", "%Name": f"Folder{i}", "folderPath": f"folders/Folder{i}.yy",
+                "name": f"Folder{i}", "resourceType": "GMFolder", "resourceVersion": "2.0"}
+               for i in range(count // 50)]
+    resources = [{"id": {"name": f"spr_{i}", "path": f"sprites/spr_{i}/spr_{i}.yy"}}
+                 for i in range(count)]
+    data = {"$GMProject": "", "%Name": "Bench", "AudioGroups": [], "configs": {"children": [], "name": "Default"},
+            "Folders": folders, "name": "Bench", "resources": resources,
+            "resourceType": "GMProject", "resourceVersion": "2.0"}
+    return json5.dumps(data, quote_keys=True, indent=2)
+
+
+def timed(func, arg, seconds=1.0):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func(arg)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return elapsed / runs
+
+
+def stdlib_loads(text):
+    orjson, parsing.orjson = parsing.orjson, None
+    try:
+        return parsing.loads(text)
+    finally:
+        parsing.orjson = orjson
+
+
+def bench(name, text):
+    mb = len(text.encode("utf-8")) / 1e6
+    data = parsing.loads(text)
+    rows = [
+        ("json5.loads", json5.loads, text),
+        ("parsing.loads (json)", stdlib_loads, text),
+    ]
+    if parsing.orjson is not None:
+        rows.append(("parsing.loads (orjson)", parsing.loads, text))
+    rows.extend([
+        ("json5.dumps", lambda d: json5.dumps(d, quote_keys=True, indent=2), data),
+        ("parsing.dumps", parsing.dumps, data),
+    ])
+
+    print(f"{name} ({mb:.2f} MB)")
+    for label, func, arg in rows:
+        seconds = timed(func, arg)
+        print(f"  {label:<24}{seconds * 1e3:>10.2f} ms{seconds / mb * 1e3:>10.2f} ms/MB")
+
+
+def main(argv):
+    if argv:
+        for path in argv:
+            with open(path, "r", encoding="utf-8") as f:
+                bench(os.path.basename(path), f.read())
+        return 0
+
+    bench("sample .yyp, 20000 resources", sample_yyp(20000))
+    bench("sample sprite .yy, 200 frames", sprite(SPRITE_2023, SPRITE_2023_FRAME, 200))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: `YYProject.save` after a few changes to a large project.
+
+    python benchmarks/bench_save.py [--resources 30000] [--folders 2000] [--changes 1 10 100]
+
+The project is written the way GameMaker lays it out, one line per entry.
+Each round adds `--changes` folders and resources, and the save is timed
+patching the file and writing the whole project.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from gmdm.models import YYAsset, YYFolder, YYProject
+
+
+def project_text(folders, resources):
+    lines = ['{', '  "$GMProject":"",', '  "%Name":"P",', '  "Folders":[']
+    lines += [f'    {{"$GMFolder":"","%Name":"F{i:05d}","folderPath":"folders/F{i:05d}.yy",'
+              f'"name":"F{i:05d}","resourceType":"GMFolder","resourceVersion":"2.0",}},'
+              for i in range(folders)]
+    lines += ['  ],', '  "name":"P",', '  "resources":[']
+    lines += [f'    {{"id":{{"name":"spr_{i:05d}","path":"sprites/spr_{i:05d}/spr_{i:05d}.yy",}},}},'
+              for i in range(resources)]
+    lines += ['  ],', '  "resourceType":"GMProject",', '  "resourceVersion":"2.0",', '}']
+    return "\n".join(lines)
+
+
+def timed_save(path, text, changes, patch):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    project = YYProject(path)
+    for i in range(changes):
+        project.add_yyfolder(YYFolder(f"folders/F{i * 7:05d}x.yy"))
+        project.add_yyasset(YYAsset(f"sprites/spr_{i * 11:05d}x/spr_{i * 11:05d}x.yy", project))
+    if not patch:
+        # As if the file changed since it was read.
+        project._stat = None
+    start = time.perf_counter()
+    project.save()
+    return time.perf_counter() - start
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resources", type=int, default=30000)
+    parser.add_argument("--folders", type=int, default=2000)
+    parser.add_argument("--changes", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args(argv)
+
+    text = project_text(args.folders, args.resources)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "P.yyp")
+        print(f"{args.resources} resources, {args.folders} folders")
+        for changes in args.changes:
+            patched = timed_save(path, text, changes, True)
+            full = timed_save(path, text, changes, False)
+            print(f"  changes={changes:<6}patch {patched:>8.3f} s   full {full:>8.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: the stages of a sync on synthetic projects.
+
+    python benchmarks/bench_sync.py [--assets 1000] [--depth 2] [--frames 2]
+        [--deps 1] [--changed 0.1] [--repeat 3] [-o results.json]
+        [--baseline old.json]
+
+Each round generates a workspace (see `synthetic.py`) and times a first sync
+and a sync after `--changed` of the dependency assets were modified. The
+stages are: resolving imports from gmdm.yml, loading the projects, planning
+(which includes comparing directories, also reported alone) and executing.
+The best time of each stage over the rounds is reported, and can be written
+as JSON to compare with another version using `--baseline`.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+from gmdm.app import App
+from gmdm.cache import MetadataCache
+from gmdm.cli import build_parser
+from gmdm.defaults import GMDM_FILE
+from gmdm.optimizer import optimize_operations
+from gmdm.server import ProjectPool
+
+sys.path.insert(0, os.path.dirname(__file__))
+from synthetic import change_assets, make_workspace  # noqa: E402
+
+STAGES = ("resolve", "load", "plan", "compare", "execute", "total")
+
+
+class TimedApp(App):
+    """Accumulates the time spent comparing resources."""
+
+    def __init__(self, logger):
+        super().__init__(logger)
+        self.compare_time = 0.0
+
+    def compare_resource(self, main_project, left, right):
+        start = time.perf_counter()
+        try:
+            return super().compare_resource(main_project, left, right)
+        finally:
+            self.compare_time += time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def timed(times, stage):
+    start = time.perf_counter()
+    yield
+    times[stage] = time.perf_counter() - start
+
+
+def run_sync(main_dir, jobs=1, cache=None, runner=None):
+    """Sync the project in main_dir, return the time of each stage."""
+    cwd = os.getcwd()
+    os.chdir(main_dir)
+    try:
+        app = TimedApp(logging.getLogger("GmDm"))
+        app.cache = cache
+        app.projects = ProjectPool()
+        argv = ["sync", "--jobs", str(jobs)] + (["--runner", runner] if runner else [])
+        args = build_parser().parse_args(argv)
+        times = {}
+        start = time.perf_counter()
+        with timed(times, "resolve"):
+            ymldict = app.get_yaml(os.path.join(main_dir, GMDM_FILE))
+        with timed(times, "load"):
+            # Writable as in a sync, see `App.load_sync`.
+            _, project = app.load_sync(args)
+            for _import in ymldict["imports"]:
+                app.load_project(_import["path"]).load_assets()
+        with timed(times, "plan"):
+            ops = optimize_operations(app.operations_from_ymldict(ymldict, project))
+        times["compare"] = app.compare_time
+        with timed(times, "execute"):
+            app.execute(ops, project)
+        times["total"] = time.perf_counter() - start
+        times["operations"] = len(ops)
+        return times
+    finally:
+        os.chdir(cwd)
+
+
+def run_round(args):
+    with tempfile.TemporaryDirectory() as directory:
+        main_dir = make_workspace(directory, args.assets, args.depth,
+                                  args.frames, args.deps)
+        cache = MetadataCache(os.path.join(directory, "cache.sqlite")) \
+            if args.cache else None
+        try:
+            initial = run_sync(main_dir, args.jobs, cache, args.runner)
+            changed = change_assets(directory, args.changed)
+            incremental = run_sync(main_dir, args.jobs, cache, args.runner)
+            incremental["changed_assets"] = changed
+        finally:
+            if cache is not None:
+                cache.close()
+    return {"initial": initial, "incremental": incremental}
+
+
+def best(runs):
+    return {
+        scenario: {stage: min(run[scenario][stage] for run in runs)
+                   for stage in STAGES}
+        for scenario in runs[0]
+    }
+
+
+def print_table(result, baseline=None):
+    for scenario, times in result["best"].items():
+        print(f"{scenario}:")
+        for stage in STAGES:
+            line = f"  {stage:<10}{times[stage]:>10.3f} s"
+            if baseline is not None:
+                old = baseline["best"].get(scenario, {}).get(stage)
+                if old:
+                    line += f"{old:>10.3f} s{times[stage] / old:>8.2f}x"
+            print(line)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=1000,
+                        help="assets per dependency project")
+    parser.add_argument("--depth", type=int, default=2, help="folder depth")
+    parser.add_argument("--frames", type=int, default=2, help="frames per sprite")
+    parser.add_argument("--deps", type=int, default=1, help="dependency projects")
+    parser.add_argument("--changed", type=float, default=0.1,
+                        help="fraction of assets changed before the second sync")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--runner", choices=["serial", "threads", "async"])
+    parser.add_argument("--cache", action="store_true",
+                        help="use a metadata cache")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare with")
+    args = parser.parse_args(argv)
+
+    runs = [run_round(args) for _ in range(args.repeat)]
+    result = {
+        "gmdm": metadata.version("gmdm"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: getattr(args, key) for key in (
+            "assets", "depth", "frames", "deps", "changed", "jobs", "runner",
+            "cache")},
+        "runs": runs,
+        "best": best(runs),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"{args.deps} x {args.assets} assets, depth {args.depth}, "
+          f"{args.frames} frames, {args.changed:.0%} changed, best of {args.repeat}")
+    print_table(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark: reading the "parent" field of .yy files.
+
+Compares the old `get_json_field` path (read the whole file, then search)
+with `read_yy_parent`.
+
+    python benchmarks/bench_yy_parent.py [path/to/project | file.yy ...]
+
+Without arguments, sample sprite and object files in GameMaker's 2.3 and
+2023 layouts are generated in a temporary directory.
+"""
+import glob
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+from gmdm.utils import parsing
+from gmdm.utils.files import read_yy_parent
+
+SPRITE_23_FRAME = """    {"compositeImage":{"FrameId":{"name":"{uuid}","path":"sprites/spr_player/spr_player.yy",},"LayerId":null,"resourceVersion":"1.0","name":"","tags":[],"resourceType":"GMSpriteBitmap",},"images":[{"FrameId":{"name":"{uuid}","path":"sprites/spr_player/spr_player.yy",},"LayerId":{"name":"a1b2c3d4-0000-4000-8000-000000000000","path":"sprites/spr_player/spr_player.yy",},"resourceVersion":"1.0","name":"","tags":[],"resourceType":"GMSpriteBitmap",},],"parent":{"name":"spr_player","path":"sprites/spr_player/spr_player.yy",},"resourceVersion":"1.0","name":"{uuid}","tags":[],"resourceType":"GMSpriteFrame",},
+"""
+
+SPRITE_23 = """{
+  "bboxMode": 0,
+  "collisionKind": 1,
+  "type": 0,
+  "origin": 4,
+  "preMultiplyAlpha": false,
+  "edgeFiltering": false,
+  "collisionTolerance": 0,
+  "swfPrecision": 2.525,
+  "bbox_left": 0,
+  "bbox_right": 31,
+  "bbox_top": 0,
+  "bbox_bottom": 31,
+  "HTile": false,
+  "VTile": false,
+  "For3D": false,
+  "width": 32,
+  "height": 32,
+  "textureGroupId": {
+    "name": "Default",
+    "path": "texturegroups/Default",
+  },
+  "swatchColours": null,
+  "gridX": 0,
+  "gridY": 0,
+  "frames": [
+{frames}  ],
+  "sequence": {
+    "spriteId": {"name":"spr_player","path":"sprites/spr_player/spr_player.yy",},
+    "timeUnits": 1,
+    "playback": 1,
+    "playbackSpeed": 15.0,
+    "playbackSpeedType": 0,
+    "autoRecord": true,
+    "volume": 1.0,
+    "length": {count}.0,
+    "events": {"Keyframes":[],"resourceVersion":"1.0","resourceType":"KeyframeStore<MessageEventKeyframe>",},
+    "moments": {"Keyframes":[],"resourceVersion":"1.0","resourceType":"KeyframeStore<MomentsEventKeyframe>",},
+    "tracks": [],
+    "visibleRange": null,
+    "lockOrigin": false,
+    "showBackdrop": true,
+    "showBackdropImage": false,
+    "backdropImagePath": "",
+    "backdropImageOpacity": 0.5,
+    "backdropWidth": 1366,
+    "backdropHeight": 768,
+    "backdropXOffset": 0.0,
+    "backdropYOffset": 0.0,
+    "xorigin": 16,
+    "yorigin": 16,
+    "eventToFunction": {},
+    "eventStubScript": null,
+    "parent": {"name":"spr_player","path":"sprites/spr_player/spr_player.yy",},
+    "resourceVersion": "1.3",
+    "name": "spr_player",
+    "tags": [],
+    "resourceType": "GMSequence",
+  },
+  "layers": [
+    {"visible":true,"isLocked":false,"blendMode":0,"opacity":100.0,"displayName":"default","resourceVersion":"1.0","name":"a1b2c3d4-0000-4000-8000-000000000000","tags":[],"resourceType":"GMImageLayer",},
+  ],
+  "nineSlice": null,
+  "parent": {
+    "name": "Characters",
+    "path": "folders/Sprites/Characters.yy",
+  },
+  "resourceVersion": "1.0",
+  "name": "spr_player",
+  "tags": [],
+  "resourceType": "GMSprite",
+}"""
+
+SPRITE_2023_FRAME = """    {"$GMSpriteFrame":"","%Name":"{uuid}","name":"{uuid}","resourceType":"GMSpriteFrame","resourceVersion":"2.0",},
+"""
+
+SPRITE_2023 = """{
+  "$GMSprite":"",
+  "%Name":"spr_player",
+  "bboxMode":0,
+  "bbox_bottom":31,
+  "bbox_left":0,
+  "bbox_right":31,
+  "bbox_top":0,
+  "collisionKind":1,
+  "collisionTolerance":0,
+  "DynamicTexturePage":false,
+  "edgeFiltering":false,
+  "For3D":false,
+  "frames":[
+{frames}  ],
+  "gridX":0,
+  "gridY":0,
+  "height":32,
+  "HTile":false,
+  "layers":[
+    {"$GMImageLayer":"","%Name":"a1b2c3d4-0000-4000-8000-000000000000","blendMode":0,"displayName":"default","isLocked":false,"name":"a1b2c3d4-0000-4000-8000-000000000000","opacity":100.0,"resourceType":"GMImageLayer","resourceVersion":"2.0","visible":true,},
+  ],
+  "name":"spr_player",
+  "nineSlice":null,
+  "origin":4,
+  "parent":{
+    "name":"Characters",
+    "path":"folders/Sprites/Characters.yy",
+  },
+  "preMultiplyAlpha":false,
+  "resourceType":"GMSprite",
+  "resourceVersion":"2.0",
+  "sequence":{
+    "$GMSequence":"",
+    "%Name":"spr_player",
+    "autoRecord":true,
+    "backdropHeight":768,
+    "backdropImageOpacity":0.5,
+    "backdropImagePath":"",
+    "backdropWidth":1366,
+    "events":{"$KeyframeStore<MessageEventKeyframe>":"","Keyframes":[],"resourceType":"KeyframeStore<MessageEventKeyframe>","resourceVersion":"2.0",},
+    "length":{count}.0,
+    "lockOrigin":false,
+    "moments":{"$KeyframeStore<MomentsEventKeyframe>":"","Keyframes":[],"resourceType":"KeyframeStore<MomentsEventKeyframe>","resourceVersion":"2.0",},
+    "name":"spr_player",
+    "playback":1,
+    "playbackSpeed":15.0,
+    "playbackSpeedType":0,
+    "resourceType":"GMSequence",
+    "resourceVersion":"2.0",
+    "showBackdrop":true,
+    "showBackdropImage":false,
+    "timeUnits":1,
+    "tracks":[],
+    "visibleRange":null,
+    "xorigin":16,
+    "yorigin":16,
+  },
+  "swatchColours":null,
+  "swfPrecision":2.525,
+  "textureGroupId":{
+    "name":"Default",
+    "path":"texturegroups/Default",
+  },
+  "type":0,
+  "VTile":false,
+  "width":32,
+}"""
+
+OBJECT_2023 = """{
+  "$GMObject":"",
+  "%Name":"obj_player",
+  "eventList":[
+    {"$GMEvent":"v1","%Name":"","collisionObjectId":null,"eventNum":0,"eventType":0,"isDnD":false,"name":"","resourceType":"GMEvent","resourceVersion":"2.0",},
+    {"$GMEvent":"v1","%Name":"","collisionObjectId":null,"eventNum":0,"eventType":3,"isDnD":false,"name":"","resourceType":"GMEvent","resourceVersion":"2.0",},
+    {"$GMEvent":"v1","%Name":"","collisionObjectId":null,"eventNum":0,"eventType":8,"isDnD":false,"name":"","resourceType":"GMEvent","resourceVersion":"2.0",},
+  ],
+  "managed":true,
+  "name":"obj_player",
+  "overriddenProperties":[],
+  "parent":{
+    "name":"Objects",
+    "path":"folders/Objects.yy",
+  },
+  "parentObjectId":null,
+  "persistent":false,
+  "physicsAngularDamping":0.1,
+  "physicsDensity":0.5,
+  "physicsFriction":0.2,
+  "physicsGroup":1,
+  "physicsKinematic":false,
+  "physicsLinearDamping":0.1,
+  "physicsObject":false,
+  "physicsRestitution":0.1,
+  "physicsSensor":false,
+  "physicsShape":1,
+  "physicsShapePoints":[],
+  "physicsStartAwake":true,
+  "properties":[],
+  "resourceType":"GMObject",
+  "resourceVersion":"2.0",
+  "solid":false,
+  "spriteId":{
+    "name":"spr_player",
+    "path":"sprites/spr_player/spr_player.yy",
+  },
+  "spriteMaskId":null,
+  "visible":true,
+}"""
+
+
+def sprite(template, frame, count):
+    frames = "".join(frame.replace("{uuid}", "%08x-0000-4000-8000-%012x" % (i, i))
+                     for i in range(count))
+    return template.replace("{frames}", frames).replace("{count}", str(count))
+
+
+def sample_files(directory):
+    samples = {
+        "sprite_23_4frames.yy": sprite(SPRITE_23, SPRITE_23_FRAME, 4),
+        "sprite_23_200frames.yy": sprite(SPRITE_23, SPRITE_23_FRAME, 200),
+        "sprite_2023_4frames.yy": sprite(SPRITE_2023, SPRITE_2023_FRAME, 4),
+        "sprite_2023_200frames.yy": sprite(SPRITE_2023, SPRITE_2023_FRAME, 200),
+        "object_2023.yy": OBJECT_2023,
+    }
+    paths = []
+    for name, content in samples.items():
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        paths.append(path)
+    return paths
+
+
+def get_json_field(field, string):
+    """The old lookup: the first `field` key of the text, even a nested one."""
+    match = re.search(rf'"{field}":\s*', string)
+    if not match:
+        return None
+    start = match.span()[0]
+    dstr = string[start:]
+    s = 0
+    end = start+1
+    for i, c in enumerate(dstr):
+        if c == '{':
+            s += 1
+        elif c == '}':
+            s -= 1
+            if s == 0:
+                end = i+1
+                break
+    data = parsing.loads("{" + dstr[:end] + "}")
+    return data.get(field)
+
+
+def old_parent(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = f.read()
+    return get_json_field("parent", data)
+
+
+def bench(paths, number):
+    print(f"{'file':<32}{'size':>9}{'get_json_field':>17}{'read_yy_parent':>17}{'speedup':>9}")
+    for path in paths:
+        old = min(timeit.repeat(lambda: old_parent(path), number=number, repeat=5))
+        new = min(timeit.repeat(lambda: read_yy_parent(path), number=number, repeat=5))
+        print(f"{os.path.basename(path)[:31]:<32}{os.path.getsize(path):>9}"
+              f"{old / number * 1e6:>14.1f} us{new / number * 1e6:>14.1f} us"
+              f"{old / new:>8.1f}x")
+        old_path = (old_parent(path) or {}).get("path")
+        new_path = (read_yy_parent(path) or (None, None)).path
+        if old_path != new_path:
+            # get_json_field picks the first "parent" key, even a nested one.
+            print(f"  results differ: {old_path!r} vs {new_path!r}")
+
+
+def main(argv):
+    paths = []
+    for arg in argv:
+        if os.path.isdir(arg):
+            paths.extend(sorted(glob.glob(os.path.join(arg, "**", "*.yy"),
+                                          recursive=True)))
+        else:
+            paths.append(arg)
+
+    if paths:
+        bench(paths, 200)
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        bench(sample_files(directory), 1000)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
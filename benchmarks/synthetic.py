@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Synthetic GameMaker projects for the benchmarks.
+
+`make_workspace` writes a main project importing `deps` dependency projects,
+each with `assets` sprites of `frames` frames, spread over folders nested
+`depth` levels deep. `change_assets` then modifies a fraction of them.
+"""
+import os
+import random
+
+from gmdm.utils import parsing
+
+SPRITE = """{
+  "$GMSprite":"",
+  "%%Name":"%(name)s",
+  "bboxMode":0,
+  "bbox_bottom":63,
+  "bbox_left":0,
+  "bbox_right":63,
+  "bbox_top":0,
+  "frames":[
+%(frames)s  ],
+  "height":64,
+  "name":"%(name)s",
+  "parent":{
+    "name":"%(folder_name)s",
+    "path":"%(folder)s",
+  },
+  "resourceType":"GMSprite",
+  "resourceVersion":"2.0",
+  "sequence":{
+    "$GMSequence":"",
+    "%%Name":"%(name)s",
+    "length":%(count)d.0,
+    "name":"%(name)s",
+    "parent":{
+      "name":"%(name)s",
+      "path":"sprites/%(name)s/%(name)s.yy",
+    },
+    "playbackSpeed":30.0,
+    "resourceType":"GMSequence",
+    "resourceVersion":"2.0",
+  },
+  "width":64,
+}"""
+
+SPRITE_FRAME = """    {"$GMSpriteFrame":"","%%Name":"f%(i)d","name":"f%(i)d","resourceType":"GMSpriteFrame","resourceVersion":"2.0",},
+"""
+
+# Folders per dependency project, the assets are spread over them.
+FOLDERS = 8
+
+# Bytes per frame image.
+FRAME_SIZE = 1024
+
+
+def folder_paths(name, depth):
+    """Return the leaf folders of a dependency project, without "folders/"."""
+    paths = []
+    for i in range(FOLDERS):
+        parts = [name] + [f"Group{i % 2}_{level}" for level in range(depth - 1)]
+        paths.append("/".join(parts + [f"Sprites{i}"]))
+    return paths
+
+
+def make_project(directory, name, assets, folders, frames, seed=0):
+    """Write a project of sprites spread over folders, return its .yyp path."""
+    rnd = random.Random(F"{name}:{seed}")
+    yyfolders = {}
+    for path in folders:
+        parts = path.split("/")
+        for i in range(1, len(parts) + 1):
+            pathyy = "folders/" + "/".join(parts[:i]) + ".yy"
+            yyfolders[pathyy] = {"$GMFolder": "", "%Name": parts[i - 1],
+                                 "folderPath": pathyy, "name": parts[i - 1],
+                                 "resourceType": "GMFolder", "resourceVersion": "2.0"}
+
+    resources = []
+    for i in range(assets):
+        res = f"spr_{name}_{i}"
+        folder = "folders/" + folders[i % len(folders)] + ".yy"
+        res_dir = os.path.join(directory, "sprites", res)
+        os.makedirs(res_dir, exist_ok=True)
+        with open(os.path.join(res_dir, res + ".yy"), "w", encoding="utf-8") as f:
+            f.write(SPRITE % {
+                "name": res, "count": frames,
+                "frames": "".join(SPRITE_FRAME % {"i": k} for k in range(frames)),
+                "folder": folder, "folder_name": folder.split("/")[-1][:-3],
+            })
+        for k in range(frames):
+            with open(os.path.join(res_dir, f"f{k}.png"), "wb") as f:
+                f.write(rnd.randbytes(FRAME_SIZE))
+        resources.append({"id": {"name": res, "path": f"sprites/{res}/{res}.yy"}})
+
+    path = os.path.join(directory, name + ".yyp")
+    with open(path, "w", encoding="utf-8") as f:
+        parsing.dump({"$GMProject": "", "%Name": name,
+                      "Folders": list(yyfolders.values()), "name": name,
+                      "resources": resources, "resourceType": "GMProject",
+                      "resourceVersion": "2.0"}, f)
+    return path
+
+
+def make_workspace(directory, assets=1000, depth=2, frames=2, deps=1):
+    """Write a main project importing `deps` projects, return its directory."""
+    imports = []
+    for d in range(deps):
+        name = f"Dep{d}"
+        dep_dir = os.path.join(directory, name)
+        os.makedirs(dep_dir, exist_ok=True)
+        make_project(dep_dir, name, assets, folder_paths(name, depth), frames)
+        with open(os.path.join(dep_dir, "gmdm.yml"), "w", encoding="utf-8") as f:
+            f.write(F"name: {name}.yyp\nexports:\n  - {name}\n")
+        imports.append(F"  - ../{name}\n")
+
+    main_dir = os.path.join(directory, "Main")
+    os.makedirs(main_dir, exist_ok=True)
+    make_project(main_dir, "Main", 0, ["Game"], frames)
+    with open(os.path.join(main_dir, "gmdm.yml"), "w", encoding="utf-8") as f:
+        f.write("name: Main.yyp\nimports:\n" + "".join(imports))
+    return main_dir
+
+
+def change_assets(directory, fraction, seed=1):
+    """Rewrite the first frame of a fraction of the dependency sprites.
+
+    Returns the number of changed assets.
+    """
+    rnd = random.Random(seed)
+    changed = 0
+    for name in sorted(os.listdir(directory)):
+        sprites = os.path.join(directory, name, "sprites")
+        if name == "Main" or not os.path.isdir(sprites):
+            continue
+        for res in sorted(os.listdir(sprites)):
+            if rnd.random() >= fraction:
+                continue
+            path = os.path.join(sprites, res, "f0.png")
+            with open(path, "wb") as f:
+                f.write(rnd.randbytes(FRAME_SIZE))
+            # Newer than the synced copy, whatever the file system resolution.
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+            changed += 1
+    return changed
@@ -2,20 +2,41 @@
 import filecmp
 import logging
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from gmdm import profiling
+from gmdm.cache import MetadataCache
 from gmdm.defaults import GMDM_FILE
+from gmdm.executor import get_executor
+from gmdm.graph import ProjectSyncOperation, topological_order
+from gmdm.journal import SyncJournal, remaining_operations, remove_interrupted_writes
 from gmdm.models import YYAsset, YYFolder, YYProject
+from gmdm.optimizer import optimize_operations
+from gmdm.plans import changed_inputs, plan_operations, read_plan, write_plan
 from gmdm.ops import (AddAssetOperation, AddFolderOperation,
                       CopyDirectoryOperation, JsonModifyOperation,
-                      ProjectSaveOperation)
-from gmdm.utils.files import compare_directories, read_yaml
+                      JsonWriteBuffer, ProjectSaveOperation,
+                      operation_from_dict)
+from gmdm.registry import ImportResolver, ProjectRegistry
+from gmdm.utils.files import (YY_VOLATILE_KEYS, DirectoryDiff, compare_directories,
+                              read_yaml, yy_fingerprint)
 from gmdm.utils.strings import path_to_folder
+from gmdm.watch import debounced, get_watcher
 
 _current_app = None
 
 
-def rearrange_imports(imports):
-    """Rework imports gathered from YML file."""
+def rearrange_imports(imports, cache=None, registry=None, resolver=None):
+    """Rework imports gathered from YML file.
+
+    Projects are found with `resolver` and loaded from `registry`, new ones
+    are made when not given.
+    """
+    if registry is None:
+        registry = ProjectRegistry(cache)
+    if resolver is None:
+        resolver = ImportResolver()
 
     for i, projpath in enumerate(imports):
         if isinstance(projpath, str):
@@ -25,24 +46,7 @@ def rearrange_imports(imports):
         if isinstance(projpath, dict):
             proj = list(projpath)[0]
             fdr = projpath[proj]
-            possible_dirs = os.environ.get("GMDM_IMPORT_DIRS") or ""
-            possible_dirs = [p for p in possible_dirs.split(os.pathsep)]
-            possible_dirs.extend([
-                "", # Absolute path
-                ".", # Relative path
-                os.path.expanduser(
-                    '~') + '/Documents/GameMakerStudio2/Projects', # User dir
-            ])
-            possible_dirs = set(possible_dirs)
-            prj = None
-            while len(possible_dirs) > 0:
-                _dir = possible_dirs.pop()
-                if _dir != "":
-                    _dir = _dir + os.sep
-                if os.path.exists(_dir + proj):
-                    prj = _dir + proj
-                    break
-
+            prj = resolver.resolve(proj)
             if prj is None:
                 raise LookupError(f"Project was not found: \"{proj}\"")
 
@@ -86,15 +90,12 @@ def rearrange_imports(imports):
                             del imports[i][proj][j]
                             continue
                         else:
-                            current_project2 = YYProject(
-                                proj + os.sep + ymldict2["name"])
-
                             if "exports" not in ymldict2:
+                                current_project2 = registry.get(
+                                    proj + os.sep + ymldict2["name"])
                                 ymldict2["exports"] = [f.pathyy[:-3]
                                                        for f in current_project2.folders]
 
-                            del current_project2
-
                             if ymldict2["exports"]:
                                 for k, val in enumerate(ymldict2["exports"]):
                                     ymldict2["exports"][k] = path_to_folder(
@@ -139,6 +140,27 @@ def rearrange_imports(imports):
     return imports
 
 
+def _plan_import(payload):
+    """Plan a single import in a worker process.
+
+    Returns the serialized operations and the resources to record in the
+    manifest.
+    """
+    _import, project_path, use_cache, load_workers, volatile_keys = payload
+    app = App(logging.getLogger("GmDm"))
+    app.load_workers = load_workers
+    app.volatile_keys = volatile_keys
+    if use_cache:
+        app.cache = MetadataCache.open()
+    try:
+        ops = app.operations_from_ymldict(
+            {"imports": [_import]}, YYProject(project_path))
+        return [op.to_dict() for op in ops], app._manifest_pending
+    finally:
+        if app.cache is not None:
+            app.cache.close()
+
+
 class App:
     """The basic GmDm App.
     """
@@ -147,6 +169,23 @@ class App:
         self.logger = logger
 
         self.cwd = os.getcwd()
+        self.cache = None
+        self.load_workers = 1
+        self.plan_processes = 1
+        self.jobs = 1
+        # See `gmdm.executor.get_executor`, None picks by jobs.
+        self.runner = None
+        # Top-level keys of .yy files that are not compared.
+        self.volatile_keys = YY_VOLATILE_KEYS
+        # Loaded projects kept by the daemon, see `gmdm.server.ProjectPool`.
+        self.projects = None
+        # The projects and import locations of the current run.
+        self.registry = None
+        self.resolver = None
+        # Directory of the project when it is not the working directory.
+        self.base_dir = None
+        # Resource directories (local, source) to record in the manifest.
+        self._manifest_pending = []
 
     def get_yaml(self, fpath):
         ymldict = read_yaml(fpath)
@@ -160,8 +199,20 @@ class App:
             ymldict["imports"] = []
         if "exports" not in ymldict:
             ymldict["exports"] = []
-
-        ymldict["imports"] = rearrange_imports(ymldict['imports'])
+        if "load_workers" not in ymldict:
+            ymldict["load_workers"] = 1
+        if "plan_processes" not in ymldict:
+            ymldict["plan_processes"] = 1
+        if "jobs" not in ymldict:
+            ymldict["jobs"] = 1
+        if "runner" not in ymldict:
+            ymldict["runner"] = None
+        if "volatile_keys" not in ymldict:
+            ymldict["volatile_keys"] = []
+
+        with profiling.phase("resolve_imports"):
+            ymldict["imports"] = rearrange_imports(
+                ymldict['imports'], self.cache, self.get_registry(), self.resolver)
         return ymldict
 
     def run(self, args):
@@ -169,172 +220,671 @@ class App:
         """
         if args.command:
             cmd = getattr(self, "command_" + args.command)
-            cmd(args)
+            if not (args.profile or args.cprofile or args.tracemalloc):
+                return cmd(args)
+            with profiling.profiled(args.cprofile, args.tracemalloc) as profile:
+                code = cmd(args)
+            # On stderr, to keep the output of `gmdm plan` clean.
+            print(profiling.format_report(profile, args.profile_format),
+                  file=sys.stderr)
+            return code
+
+    def get_registry(self) -> ProjectRegistry:
+        if self.registry is None:
+            self.registry = ProjectRegistry(self.cache, self.projects)
+        return self.registry
+
+    def local_path(self, path):
+        """Return the path of a file of the project from the working directory."""
+        if self.base_dir is None:
+            return path
+        return os.path.join(self.base_dir, path)
+
+    def load_project(self, path) -> YYProject:
+        """Load an imported project, once per run."""
+        return self.get_registry().get(path)
+
+    def compare_resource(self, main_project: YYProject, left, right):
+        """Compare a local resource directory (left) with its source (right).
+
+        Returns a `DirectoryDiff`, see `compare_directories`. When the manifest
+        of the last sync has the resource, only the file hashes are compared.
+        """
+        with profiling.phase("compare"):
+            return self._compare_resource(main_project, left, right)
+
+    def get_volatile_keys(self, args, ymldict):
+        return tuple(dict.fromkeys(
+            YY_VOLATILE_KEYS + tuple(args.volatile_keys or ymldict["volatile_keys"])))
+
+    def yy_fingerprint(self, path):
+        """Return the fingerprint of a .yy file, see `compare_directories`."""
+        if self.cache is not None:
+            return self.cache.yy_fingerprint(path, self.volatile_keys)
+        return yy_fingerprint(path, self.volatile_keys)
+
+    def _compare_resource(self, main_project: YYProject, left, right):
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.get_manifest(main_project.path, left)
+
+        if entry is not None and entry.source == os.path.abspath(right):
+            local_files = self.cache.hash_directory(left)
+            source_files = self.cache.hash_directory(right)
+            local_changed = local_files != entry.local_files
+            source_changed = source_files != entry.source_files
+            if not local_changed and not source_changed:
+                return DirectoryDiff([], [], [], 0)
+            if not local_changed:
+                self._manifest_pending.append((left, right))
+                return DirectoryDiff.from_hashes(local_files, source_files, -1)
+            if not source_changed:
+                self._manifest_pending.append((left, right))
+                return DirectoryDiff.from_hashes(local_files, source_files, 1,
+                                                 entry.local_files)
+            self.logger.warning(
+                F"\"{left}\" and \"{right}\" both changed since the last sync.")
+            compared = compare_directories(left, right, self.yy_fingerprint)
+            if compared.newer != 0 or not compared.changed:
+                self._manifest_pending.append((left, right))
+            # Otherwise keep the old entry so that the conflict is reported again.
+            return compared
+
+        self._manifest_pending.append((left, right))
+        return compare_directories(left, right, self.yy_fingerprint)
+
+    def record_manifest(self, main_project: YYProject):
+        """Record the synced resources in the manifest."""
+        if self.cache is not None:
+            for left, right in self._manifest_pending:
+                if os.path.isdir(left) and os.path.isdir(right):
+                    self.cache.set_manifest(main_project.path, left, right)
+        self._manifest_pending = []
+
+    def plan_resource(self, res: YYAsset, _from_fdr: YYFolder, _to_fdr: YYFolder,
+                      main_project: YYProject, ops: list, planned_folders: set):
+        """Append the operations to sync a single imported resource to ops.
+
+        Returns True if the main project is modified.
+        """
+        modified = False
+        local = self.local_path(res.path)
+        new_folder_path = res.folder.replace(
+            _from_fdr.pathyy[:-3], _to_fdr.pathyy[:-3])
+        if _from_fdr.has_asset(res):
+
+            res_to = main_project.get_resource(res.path)
+
+            if res_to is not None:
+                diff = self.compare_resource(
+                    main_project,
+                    left=os.path.dirname(local),
+                    right=os.path.dirname(res.real_path)
+                )
+                compared = diff.newer
+            else:
+                compared = None
+                self._manifest_pending.append((
+                    os.path.dirname(local),
+                    os.path.dirname(res.real_path)))
+
+            if compared is not None:
+                if compared == 1:
+                    direction = -1
+                    # Sync back resource.
+                    # There's no need for imp project save.
+                    ops.append(CopyDirectoryOperation(
+                        os.path.dirname(local),
+                        os.path.dirname(res.real_path),
+                        files=diff.copied(),
+                        name="CopyDirectoryBack"
+                    ))
+                    fdr = YYFolder(res.folder)  # Old folder path
+                    ops.append(JsonModifyOperation(
+                        res.real_path,
+                        {
+                            "parent": fdr.to_json,
+                        },
+                        name="JsonModifyBack"
+                    ))
 
-    def operations_from_ymldict(self, ymldict, main_project: YYProject):
-        ops = []
+                elif compared == -1:
+                    # Asset exists (and its folder), just copy what changed.
+                    direction = 1
+                    ops.append(CopyDirectoryOperation(
+                        os.path.dirname(res.real_path),
+                        os.path.dirname(local),
+                        files=diff.copied(),
+                    ))
 
-        main_project_modified = False
-        filecmp.clear_cache()
+                else:
+                    direction = 0
+
+            else:
+                direction = 1
+                # Make YYfolders, Add asset to project, and copy.
+                fdr = main_project.get_yyfolder(new_folder_path)
+                if fdr is None:
+                    if new_folder_path not in planned_folders:
+                        fdr = YYFolder(new_folder_path)
+                        planned_folders.add(new_folder_path)
+                        ops.append(AddFolderOperation(
+                            main_project,
+                            fdr,
+                        ))
+
+                ops.append(AddAssetOperation(
+                    main_project,
+                    YYAsset(res.path, main_project)
+                ))
+                ops.append(CopyDirectoryOperation(
+                    os.path.dirname(res.real_path),
+                    os.path.dirname(local),
+                ))
+                modified = True
+
+            # Modify copied asset to main project in case of:
+            # - newly added folder
+            # - different main asset folder
+            modify_asset_to_fdr = False
+            if _to_fdr is None:
+                modify_asset_to_fdr = True
+            else:
+                if direction == 1:
+                    if _from_fdr.pathyy != _to_fdr.pathyy:
+                        modify_asset_to_fdr = True
+
+            if modify_asset_to_fdr:
+                fdr = main_project.get_yyfolder(new_folder_path)
+                if fdr is None:
+                    fdr = YYFolder(new_folder_path)
+                    if new_folder_path not in planned_folders:
+                        planned_folders.add(new_folder_path)
+                        ops.append(AddFolderOperation(
+                            main_project,
+                            fdr,
+                        ))
+                if fdr is not None:
+                    ops.append(JsonModifyOperation(
+                        local,
+                        {
+                            "parent": fdr.to_json,
+                        }
+                    ))
 
-        for _import in ymldict["imports"]:
-            _proj = list(_import)[0]
-            imp_project = YYProject(_import["path"])
-            # We already have imports from the other projects yaml collected.
-            to_import = _import[_proj]
+        return modified
 
-            for to_imp in to_import:
-                _from_fdr = imp_project.get_folder(to_imp["from"])
-                if _from_fdr is None:
-                    raise FileNotFoundError(
-                        F"\"{to_imp['from']}\" Does not exist in Project \"{imp_project}\"")
+    def operations_from_ymldict_parallel(self, ymldict, main_project: YYProject):
+        """Plan every import in its own worker process.
 
-                _from_fdr = imp_project.get_yyfolder(to_imp["from"])
-                _to_fdr = main_project.get_yyfolder(to_imp["to"])
+        The plans are merged in import order. Folders already added by an
+        earlier import are not added again, and the project is saved after
+        its last modification.
+        """
+        payloads = [(_import, main_project.path, self.cache is not None,
+                     self.load_workers, self.volatile_keys)
+                    for _import in ymldict["imports"]]
+        with ProcessPoolExecutor(max_workers=self.plan_processes) as executor:
+            plans = list(executor.map(_plan_import, payloads))
 
-                if _to_fdr is None:
-                    _to_fdr = YYFolder(to_imp["to"])
-                    ops.append(AddFolderOperation(
-                        main_project,
-                        _to_fdr,
-                    ))
-                    main_project_modified = True
+        projects = {main_project.path: main_project}
+        ops = []
+        added_folders = set()
+        unsaved = False
+        for op_dicts, manifest_pending in plans:
+            self._manifest_pending.extend(manifest_pending)
+            for dic in op_dicts:
+                if dic["op"] == "AddFolder":
+                    if (dic["project"], dic["folder"]) in added_folders:
+                        continue
+                    added_folders.add((dic["project"], dic["folder"]))
+                op = operation_from_dict(dic, projects)
+                if isinstance(op, (AddFolderOperation, AddAssetOperation)):
+                    unsaved = True
+                elif isinstance(op, ProjectSaveOperation):
+                    unsaved = False
+                ops.append(op)
+
+        if unsaved:
+            ops.append(ProjectSaveOperation(main_project))
+        return ops
 
-                for res in imp_project.resources:
-                    new_folder_path = res.folder.replace(
-                        _from_fdr.pathyy[:-3], _to_fdr.pathyy[:-3])
-                    if _from_fdr.has_asset(res):
+    def operations_from_ymldict(self, ymldict, main_project: YYProject):
+        if self.plan_processes > 1 and len(ymldict["imports"]) > 1:
+            return self.operations_from_ymldict_parallel(ymldict, main_project)
 
-                        res_to = main_project.get_resource(res.path)
+        ops = []
+        # Folders with an AddFolderOperation in ops.
+        planned_folders = set()
 
-                        if res_to is not None:
-                            compared = compare_directories(
-                                left=os.path.dirname(res.path),
-                                right=os.path.dirname(res.real_path)
-                            )
-                        else:
-                            compared = None
-
-                        if compared is not None:
-                            if compared == 1:
-                                direction = -1
-                                # Sync back resource.
-                                # There's no need for imp project save.
-                                ops.append(CopyDirectoryOperation(
-                                    os.path.dirname(res.path),
-                                    os.path.dirname(res.real_path),
-                                    name="CopyDirectoryBack"
-                                ))
-                                fdr = YYFolder(res.folder)  # Old folder path
-                                ops.append(JsonModifyOperation(
-                                    res.real_path,
-                                    {
-                                        "parent": fdr.to_json,
-                                    },
-                                    name="JsonModifyBack"
-                                ))
-
-                            elif compared == -1:
-                                # Asset exists (and its folder), just copy.
-                                direction = 1
-                                ops.append(CopyDirectoryOperation(
-                                    os.path.dirname(res.real_path),
-                                    os.path.dirname(res.path),
-                                ))
-
-                            else:
-                                direction = 0
+        main_project_modified = False
+        filecmp.clear_cache()
 
-                        else:
-                            direction = 1
-                            # Make YYfolders, Add asset to project, and copy.
-                            fdr = main_project.get_yyfolder(new_folder_path)
-                            if fdr is None:
-                                _fo = [afo for afo in ops if isinstance(
-                                    afo, AddFolderOperation)]
-                                _fo = [fo for fo in _fo
-                                       if fo.folder.pathyy == new_folder_path
-                                       and fo.project.path == main_project.path]
-                                if len(_fo) == 0:
-                                    fdr = YYFolder(new_folder_path)
-                                    ops.append(AddFolderOperation(
-                                        main_project,
-                                        fdr,
-                                    ))
-
-                            ops.append(AddAssetOperation(
-                                main_project,
-                                YYAsset(res.path, main_project)
-                            ))
-                            ops.append(CopyDirectoryOperation(
-                                os.path.dirname(res.real_path),
-                                os.path.dirname(res.path),
-                            ))
+        for _import in ymldict["imports"]:
+            with profiling.import_phase(_import["path"]):
+                _proj = list(_import)[0]
+                with profiling.phase("load_dependencies"):
+                    imp_project = self.load_project(_import["path"])
+                    imp_project.load_assets(workers=self.load_workers)
+                # We already have imports from the other projects yaml collected.
+                to_import = _import[_proj]
+
+                for to_imp in to_import:
+                    _from_fdr = imp_project.get_folder(to_imp["from"])
+                    if _from_fdr is None:
+                        raise FileNotFoundError(
+                            F"\"{to_imp['from']}\" Does not exist in Project \"{imp_project}\"")
+
+                    _from_fdr = imp_project.get_yyfolder(to_imp["from"])
+                    _to_fdr = main_project.get_yyfolder(to_imp["to"])
+
+                    if _to_fdr is None:
+                        _to_fdr = YYFolder(to_imp["to"])
+                        planned_folders.add(_to_fdr.pathyy)
+                        ops.append(AddFolderOperation(
+                            main_project,
+                            _to_fdr,
+                        ))
+                        main_project_modified = True
+
+                    for res in imp_project.resources:
+                        if self.plan_resource(res, _from_fdr, _to_fdr, main_project,
+                                              ops, planned_folders):
                             main_project_modified = True
 
-                        # Modify copied asset to main project in case of:
-                        # - newly added folder
-                        # - different main asset folder
-                        modify_asset_to_fdr = False
-                        if _to_fdr is None:
-                            modify_asset_to_fdr = True
-                        else:
-                            if direction == 1:
-                                if _from_fdr.pathyy != _to_fdr.pathyy:
-                                    modify_asset_to_fdr = True
-
-                        if modify_asset_to_fdr:
-                            fdr = main_project.get_yyfolder(new_folder_path)
-                            if fdr is None:
-                                fdr = YYFolder(new_folder_path)
-                                _fo = [afo for afo in ops if isinstance(
-                                    afo, AddFolderOperation)]
-                                _fo = [fo for fo in _fo
-                                       if fo.folder.pathyy == new_folder_path
-                                       and fo.project.path == main_project.path]
-                                if len(_fo) == 0:
-                                    ops.append(AddFolderOperation(
-                                        main_project,
-                                        fdr,
-                                    ))
-                            if fdr is not None:
-                                ops.append(JsonModifyOperation(
-                                    res.path,
-                                    {
-                                        "parent": fdr.to_json,
-                                    }
-                                ))
-
-                if main_project_modified:
-                    ops.append(ProjectSaveOperation(
-                        main_project,
-                    ))
+                    if main_project_modified:
+                        ops.append(ProjectSaveOperation(
+                            main_project,
+                        ))
 
         return ops
 
     def command_test(self, args):
         print("No tests applicable.")
 
-    def command_sync(self, args):
+    def open_cache(self, args):
+        if not args.no_cache:
+            with profiling.phase("cache"):
+                self.cache = MetadataCache.open()
+
+    def close_cache(self):
+        if self.cache is not None:
+            with profiling.phase("cache"):
+                self.cache.close()
+            self.cache = None
+
+    def load_sync(self, args):
+        """Read gmdm.yml and load the project.
+
+        Returns (ymldict, project), or None if the project could not be read.
+        """
+        fpath = self.cwd + os.sep + GMDM_FILE
+        # Start a new run, the files may have changed since the last one.
+        self.registry = ProjectRegistry(self.cache, self.projects)
+        self.resolver = ImportResolver()
+        try:
+            ymldict = self.get_yaml(fpath)
+        except FileNotFoundError:
+            return None
+
+        self.load_workers = args.load_workers or ymldict["load_workers"]
+        self.plan_processes = args.plan_processes or ymldict["plan_processes"]
+        self.jobs = args.jobs or ymldict["jobs"]
+        self.runner = args.runner or ymldict["runner"]
+        self.volatile_keys = self.get_volatile_keys(args, ymldict)
+        with profiling.phase("load_project"):
+            project = self.registry.get(
+                self.cwd + os.sep + ymldict["name"], writable=True)
+        return ymldict, project
+
+    def plan_sync(self, args):
+        """Read gmdm.yml, load the project and plan the sync.
+
+        Returns (project, ops), or None if the project could not be read.
+        """
+        loaded = self.load_sync(args)
+        if loaded is None:
+            return None
+        ymldict, project = loaded
+
+        with profiling.phase("plan"):
+            ops = self.operations_from_ymldict(ymldict, project)
+        with profiling.phase("optimize"):
+            ops = optimize_operations(ops)
+        return project, ops
+
+    def execute(self, ops, project: YYProject, journal: SyncJournal | None = None,
+                done=()):
+        """Run the operations, except the indexes in `done` that are finished.
+
+        Operations are recorded in the journal as they finish, and the
+        journal is removed at the end.
+        """
+        buffer = JsonWriteBuffer(ops)
+        self.logger.debug(
+            F"Buffered JSON modifications save {buffer.saved_writes} writes.")
+        if done:
+            ops = remaining_operations(ops, done, project)
+
+        def on_done(op):
+            profiling.count(F"operations.{op.get_name()}")
+            self.logger.info(str(op))
+            if journal is not None:
+                journal.record(op)
+
+        def on_progress(done, total):
+            self.logger.info(F"{done}/{total} operations done.")
+
+        try:
+            with profiling.phase("execute"):
+                get_executor(self.jobs, on_done, self.runner, on_progress).run(ops)
+        finally:
+            if journal is not None:
+                journal.close()
+        with profiling.phase("manifest"):
+            self.record_manifest(project)
+        if journal is not None:
+            journal.finish()
+
+    def has_gmdm_file(self):
         fpath = self.cwd + os.sep + GMDM_FILE
         if not os.path.exists(fpath):
             self.logger.error(f"File \"{fpath}\" does not exist.")
             return False
+        return True
 
+    def command_sync(self, args):
+        if not self.has_gmdm_file():
+            return False
+
+        self.open_cache(args)
         try:
-            ymldict = self.get_yaml(fpath)
-        except FileNotFoundError:
+            if args.recursive:
+                if args.resume:
+                    self.logger.error("--resume can't be used with -r.")
+                    return 1
+                return self.sync_graph(args)
+
+            journal = SyncJournal(self.cwd)
+            if args.resume:
+                if journal.exists():
+                    return self.resume_sync(args, journal)
+                self.logger.info("No interrupted sync to resume.")
+            elif journal.exists():
+                self.logger.warning(
+                    "An interrupted sync is started over, use --resume to finish it.")
+
+            planned = self.plan_sync(args)
+            if planned is None:
+                return 1
+            project, ops = planned
+
+            if args.fake:
+                for op in ops:
+                    self.logger.info(str(op))
+            elif ops:
+                journal.start(project, ops, self._manifest_pending)
+                self.execute(ops, project, journal)
+            else:
+                journal.finish()
+                self.execute(ops, project)
+        finally:
+            self.close_cache()
+        return 0
+
+    def resume_sync(self, args, journal: SyncJournal):
+        """Finish an interrupted sync from its journal."""
+        plan, done = journal.read()
+        loaded = self.load_sync(args)
+        if loaded is None:
+            return 1
+        _, project = loaded
+        if os.path.abspath(project.path) != plan["project"]:
+            self.logger.error(
+                F"The interrupted sync was of \"{plan['project']}\". Sync without --resume.")
             return 1
 
-        project = YYProject(self.cwd + os.sep + ymldict["name"])
+        ops = plan_operations(plan, project)
+        self.logger.info(F"Resuming a sync, {len(done)}/{len(ops)} operations were done.")
+        remove_interrupted_writes(remaining_operations(ops, done, project))
+        self._manifest_pending = [tuple(pair) for pair in plan["manifest"]]
+        journal.open(ops)
+        self.execute(ops, project, journal, done)
+        return 0
+
+    def load_graph(self):
+        """Read the gmdm.yml of every project reachable through imports.
+
+        Returns {project directory: ymldict}, with None for projects without
+        a gmdm.yml, and {project directory: [imported project directories]}.
+        """
+        self.registry = ProjectRegistry(self.cache, self.projects)
+        ymldicts = {}
+        imports = {}
+        pending = [self.cwd]
+        while pending:
+            directory = pending.pop(0)
+            if directory in imports:
+                continue
+            fpath = directory + os.sep + GMDM_FILE
+            if not os.path.exists(fpath):
+                ymldicts[directory] = None
+                imports[directory] = []
+                continue
+            self.resolver = ImportResolver(
+                base=None if directory == self.cwd else directory)
+            ymldicts[directory] = self.get_yaml(fpath)
+            imports[directory] = [os.path.abspath(os.path.dirname(_import["path"]))
+                                  for _import in ymldicts[directory]["imports"]]
+            pending.extend(imports[directory])
+        return ymldicts, imports
+
+    def sync_project(self, directory, ymldict, args):
+        """Sync a project of the graph with its own `App`."""
+        app = App(self.logger)
+        app.cwd = directory
+        if os.path.abspath(directory) != os.getcwd():
+            app.base_dir = directory
+        app.cache = self.cache
+        app.projects = self.projects
+        app.registry = self.registry
+        app.load_workers = args.load_workers or ymldict["load_workers"]
+        app.jobs = args.jobs or ymldict["jobs"]
+        app.runner = args.runner or ymldict["runner"]
+        app.volatile_keys = self.get_volatile_keys(args, ymldict)
+
+        self.logger.info(F"Syncing \"{directory}\".")
+        project = app.registry.get(directory + os.sep + ymldict["name"], writable=True)
+        ops = optimize_operations(app.operations_from_ymldict(ymldict, project))
+        if args.fake:
+            for op in ops:
+                self.logger.info(str(op))
+        else:
+            app.execute(ops, project)
+
+    def sync_graph(self, args):
+        """Sync every project reachable through imports, imports first.
+
+        Projects that do not share imports are synced concurrently.
+        """
+        ymldicts, imports = self.load_graph()
+        try:
+            order = topological_order(imports)
+        except ValueError as e:
+            self.logger.error(str(e))
+            return 1
+
+        ops = [ProjectSyncOperation(
+            directory, imports[directory],
+            lambda d: self.sync_project(d, ymldicts[d], args))
+            for directory in order
+            if ymldicts[directory] is not None and imports[directory]]
+        jobs = args.jobs or ymldicts[self.cwd]["jobs"]
+        get_executor(jobs).run(ops)
+        return 0
+
+    def watch_targets(self, ymldict, main_project: YYProject):
+        """Return the resources to watch and the project files.
+
+        Resources are given as {asset directory: [(res, from, to), ...]}, by
+        both their source and local directories.
+        """
+        contexts = {}
+        project_files = {os.path.abspath(self.cwd + os.sep + GMDM_FILE)}
+        for _import in ymldict["imports"]:
+            _proj = list(_import)[0]
+            imp_project = self.load_project(_import["path"])
+            imp_project.load_assets(workers=self.load_workers)
+            project_files.add(os.path.abspath(imp_project.path))
+
+            for to_imp in _import[_proj]:
+                _from_fdr = imp_project.get_yyfolder(to_imp["from"])
+                _to_fdr = main_project.get_yyfolder(to_imp["to"]) or \
+                    YYFolder(to_imp["to"])
+                if _from_fdr is None:
+                    continue
+                for res in imp_project.resources:
+                    if not _from_fdr.has_asset(res):
+                        continue
+                    for path in (res.real_path, self.local_path(res.path)):
+                        contexts.setdefault(
+                            os.path.abspath(os.path.dirname(path)), []).append(
+                                (res, _from_fdr, _to_fdr))
+        return contexts, project_files
+
+    def watch_changes(self, watcher, main_project: YYProject, contexts,
+                      project_files, debounce):
+        """Sync the resources that change, until a project file changes."""
+        for changed in debounced(watcher, debounce):
+            if changed & project_files:
+                self.logger.info("A project file changed, reloading.")
+                return
+
+            targets = {}
+            for path in changed:
+                while path not in contexts and os.path.dirname(path) != path:
+                    path = os.path.dirname(path)
+                for ctx in contexts.get(path, ()):
+                    targets[(ctx[0].real_path, ctx[2].pathyy)] = ctx
+
+            try:
+                self.sync_changes(main_project, targets.values())
+            except Exception as e:  # pylint: disable=W0703
+                # Keep watching, the next change may fix it.
+                self.logger.error(F"The changes could not be synced: {e}")
+
+    def sync_changes(self, main_project: YYProject, targets):
+        """Sync the (resource, from folder, to folder) that changed."""
+        ops = []
+        planned_folders = set()
+        modified = False
+        for res, _from_fdr, _to_fdr in targets:
+            local = os.path.dirname(self.local_path(res.path))
+            if not os.path.isdir(os.path.dirname(res.real_path)) or (
+                    not os.path.isdir(local)
+                    and main_project.get_resource(res.path) is not None):
+                self.logger.warning(
+                    F"\"{res.path}\" was deleted, skipping it.")
+                continue
+            # The asset may have been moved to another folder.
+            res.load()
+            if self.plan_resource(res, _from_fdr, _to_fdr, main_project,
+                                  ops, planned_folders):
+                modified = True
+        if modified:
+            ops.append(ProjectSaveOperation(main_project))
+
+        ops = optimize_operations(ops)
+        if ops:
+            self.execute(ops, main_project)
+
+    def command_watch(self, args):
+        if not self.has_gmdm_file():
+            return False
+
+        self.open_cache(args)
+        try:
+            while True:
+                loaded = self.load_sync(args)
+                if loaded is None:
+                    return 1
+                ymldict, project = loaded
+                self.execute(optimize_operations(
+                    self.operations_from_ymldict(ymldict, project)), project)
+
+                contexts, project_files = self.watch_targets(ymldict, project)
+                watcher = get_watcher(args.poll)
+                try:
+                    for path in contexts:
+                        if os.path.isdir(path):
+                            watcher.add(path)
+                    for path in project_files:
+                        watcher.add(os.path.dirname(path), recursive=False)
+                    self.logger.info(
+                        F"Watching {len(contexts)} asset directories. Press Ctrl+C to stop.")
+                    self.watch_changes(watcher, project, contexts,
+                                       project_files, args.debounce)
+                finally:
+                    watcher.close()
+        except KeyboardInterrupt:
+            return 0
+        finally:
+            self.close_cache()
+
+    def command_serve(self, args):
+        from gmdm.server import Daemon  # pylint: disable=C0415
+        return Daemon().serve()
+
+    def command_status(self, args):
+        # Answered by the daemon when one is running.
+        self.logger.info("No daemon is running.")
+        return 1
+
+    def command_plan(self, args):
+        if not self.has_gmdm_file():
+            return False
+
+        self.open_cache(args)
+        try:
+            planned = self.plan_sync(args)
+        finally:
+            self.close_cache()
+        if planned is None:
+            return 1
+        project, ops = planned
 
-        # Get operations
-        ops = self.operations_from_ymldict(ymldict, project)
-        # Do operations
         for op in ops:
-            if not args.fake:
-                op.run()
             self.logger.info(str(op))
+        write_plan(args.output or "-", project, ops, self._manifest_pending)
+        self._manifest_pending = []
+        return 0
+
+    def command_apply(self, args):
+        if not args.file:
+            self.logger.error("No plan file given.")
+            return 1
+        plan = read_plan(args.file)
+
+        changed = changed_inputs(plan["inputs"])
+        if changed:
+            self.logger.error(
+                F"{len(changed)} files changed since the plan was made, "
+                F"e.g. \"{changed[0]}\". Plan again.")
+            return 1
+
+        os.chdir(plan["cwd"])
+        self.cwd = plan["cwd"]
+        self.jobs = args.jobs or 1
+        self.runner = args.runner
+        project = YYProject(plan["project"])
+        ops = plan_operations(plan, project)
+        self._manifest_pending = [tuple(pair) for pair in plan["manifest"]]
+
+        self.open_cache(args)
+        try:
+            self.execute(ops, project)
+        finally:
+            self.close_cache()
         return 0
 
 
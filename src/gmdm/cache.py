@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from gmdm.defaults import GMDM_CACHE_FILE, cache_dir
+from gmdm.utils.files import YY_VOLATILE_KEYS, hash_file, walk_files, yy_fingerprint
+
+logger = logging.getLogger("GmDm")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    folders TEXT NOT NULL,
+    resources TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    folder TEXT
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS yy_fingerprints (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    exclude TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifest (
+    project TEXT NOT NULL,
+    local TEXT NOT NULL,
+    source TEXT NOT NULL,
+    local_files TEXT NOT NULL,
+    source_files TEXT NOT NULL,
+    PRIMARY KEY (project, local)
+);
+"""
+
+
+class ManifestEntry(NamedTuple):
+    """File hashes of both sides of an imported resource at the last sync."""
+    source: str
+    local_files: Dict[str, str]
+    source_files: Dict[str, str]
+
+
+def stat_key(path) -> Tuple[int, int] | None:
+    """Return the (size, mtime_ns) signature of a file, or None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class MetadataCache:
+    """Persistent cache of parsed project and asset metadata.
+
+    Entries are keyed by absolute path and are only valid while the file
+    size and mtime are unchanged. Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(cache_dir(), GMDM_CACHE_FILE)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """The connection of the calling thread."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    @classmethod
+    def open(cls, path: str | None = None):
+        """Return a cache, or None when it cannot be opened."""
+        try:
+            return cls(path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Metadata cache is disabled: {e}")
+            return None
+
+    def get_project(self, path: str) -> dict | None:
+        """Return the cached {"Folders", "resources"} of a .yyp file."""
+        path = os.path.abspath(path)
+        row = self._db.execute(
+            "SELECT size, mtime_ns, folders, resources FROM projects WHERE path = ?",
+            (path,)).fetchone()
+        if row is None or stat_key(path) != tuple(row[:2]):
+            return None
+        return {
+            "Folders": json.loads(row[2]),
+            "resources": json.loads(row[3]),
+        }
+
+    def set_project(self, path: str, data: dict):
+        path = os.path.abspath(path)
+        key = stat_key(path)
+        if key is None:
+            return
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?)",
+                (path, *key,
+                 json.dumps(data["Folders"], separators=(",", ":")),
+                 json.dumps(data["resources"], separators=(",", ":"))))
+
+    def get_folders(self, paths: Iterable[str]) -> Dict[str, str | None]:
+        """Return the cached parent folders of the given .yy files.
+
+        Files without a valid entry are left out of the result.
+        """
+        paths = {os.path.abspath(p): p for p in paths}
+        found = {}
+        if not paths:
+            return found
+        # Fetch every entry under the common directory in a single query.
+        prefix = os.path.commonpath(list(paths))
+        rows = self._db.execute(
+            "SELECT path, size, mtime_ns, folder FROM assets"
+            " WHERE path >= ? AND path < ?",
+            (prefix, prefix + "\uffff"))
+        for path, size, mtime_ns, folder in rows:
+            if path in paths and stat_key(path) == (size, mtime_ns):
+                found[paths[path]] = folder
+        return found
+
+    def set_folders(self, items: Iterable[Tuple[str, str | None]]):
+        rows = []
+        for path, folder in items:
+            path = os.path.abspath(path)
+            key = stat_key(path)
+            if key is not None:
+                rows.append((path, *key, folder))
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?)", rows)
+
+    def hash_directory(self, directory: str) -> Dict[str, str]:
+        """Return {relative path: content hash} of the files in a directory.
+
+        Only files whose stat changed since they were last hashed are read.
+        """
+        directory = os.path.abspath(directory)
+        rows = self._db.execute(
+            "SELECT path, size, mtime_ns, hash FROM hashes"
+            " WHERE path >= ? AND path < ?",
+            (directory + os.sep, directory + os.sep + "\uffff"))
+        known = {path: (size, mtime_ns, h) for path, size, mtime_ns, h in rows}
+
+        hashes = {}
+        changed = []
+        for name in walk_files(directory):
+            path = directory + os.sep + name.replace("/", os.sep)
+            key = stat_key(path)
+            if key is None:
+                continue
+            row = known.get(path)
+            if row is not None and row[:2] == key:
+                hashes[name] = row[2]
+            else:
+                hashes[name] = hash_file(path)
+                changed.append((path, *key, hashes[name]))
+
+        if changed:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", changed)
+        return hashes
+
+    def yy_fingerprint(self, path: str, exclude=YY_VOLATILE_KEYS) -> str:
+        """Return the `yy_fingerprint` of a .yy file, parsed once per stat."""
+        path = os.path.abspath(path)
+        key = stat_key(path)
+        excluded = ",".join(sorted(exclude))
+        row = self._db.execute(
+            "SELECT size, mtime_ns, exclude, fingerprint FROM yy_fingerprints"
+            " WHERE path = ?", (path,)).fetchone()
+        if row is not None and key == tuple(row[:2]) and row[2] == excluded:
+            return row[3]
+        fingerprint = yy_fingerprint(path, exclude)
+        if key is not None:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO yy_fingerprints VALUES (?, ?, ?, ?, ?)",
+                    (path, *key, excluded, fingerprint))
+        return fingerprint
+
+    def get_manifest(self, project: str, local: str) -> ManifestEntry | None:
+        """Return the manifest entry of a resource directory in a project."""
+        row = self._db.execute(
+            "SELECT source, local_files, source_files FROM manifest"
+            " WHERE project = ? AND local = ?",
+            (os.path.abspath(project), os.path.abspath(local))).fetchone()
+        if row is None:
+            return None
+        return ManifestEntry(row[0], json.loads(row[1]), json.loads(row[2]))
+
+    def set_manifest(self, project: str, local: str, source: str):
+        """Record the current file hashes of both sides of a resource."""
+        row = (os.path.abspath(project), os.path.abspath(local),
+               os.path.abspath(source),
+               json.dumps(self.hash_directory(local), separators=(",", ":")),
+               json.dumps(self.hash_directory(source), separators=(",", ":")))
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)", row)
+
+    def close(self):
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections = []
+        self._local = threading.local()
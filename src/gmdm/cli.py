@@ -7,9 +7,9 @@ import argparse
 import logging
 import sys
 
-from gmdm.app import get_app
-# Variables
-from gmdm.utils.logging import get_logger
+# The app is imported when needed, so that commands forwarded to the daemon
+# start fast.
+from gmdm.client import FORWARDED_COMMANDS, forward
 
 
 def windows_enable_ansi(std_id):  # pylint: disable=R0914
@@ -85,12 +85,13 @@ def cli(command="help", **kwargs):
     if command == "help":
         sys.exit(parser.print_help(None))
     else:
+        from gmdm.app import get_app  # pylint: disable=C0415
         gmdm = get_app(logger)
         sys.exit(gmdm.run(args))
 
 
-def main():
-    "Main program"
+def build_parser():
+    "Return the argument parser"
     parser = argparse.ArgumentParser(prog='gmdm',
                                           usage='%(prog)s [options] command',
                                           description=__doc__,
@@ -102,10 +103,23 @@ def main():
 
     parser.add_argument('command',
                         help='Command to do with GMDM',
-                        choices=["help", "sync", "test",],
+                        choices=["help", "sync", "plan", "apply", "watch", "serve",
+                                 "status", "test",],
                         default="help",
                         )
 
+    parser.add_argument('file',
+                        nargs='?',
+                        help='plan file for the apply command')
+
+    parser.add_argument('-o',
+                        '--output',
+                        action='store',
+                        metavar='FILE',
+                        dest="output",
+                        default=None,
+                        help='file to write the plan to (default is stdout)')
+
     parser.add_argument('-Q',
                         '--quiet',
                         action='store_true',
@@ -126,6 +140,114 @@ def main():
                         default=False,
                         help='run without actually doing the command.')
 
+    parser.add_argument('-r',
+                        '--recursive',
+                        action='store_true',
+                        dest="recursive",
+                        default=False,
+                        help='sync: sync the imported projects first, by their own gmdm.yml.')
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        dest="resume",
+                        default=False,
+                        help='sync: finish an interrupted sync, skipping the operations it did.')
+
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        dest="no_cache",
+                        default=False,
+                        help='do not use the persistent metadata cache.')
+
+    parser.add_argument('--load-workers',
+                        action='store',
+                        metavar='N',
+                        dest="load_workers",
+                        type=int,
+                        default=None,
+                        help='read asset files of dependencies with N threads.')
+
+    parser.add_argument('--plan-processes',
+                        action='store',
+                        metavar='N',
+                        dest="plan_processes",
+                        type=int,
+                        default=None,
+                        help='plan the imports on N worker processes.')
+
+    parser.add_argument('-j',
+                        '--jobs',
+                        action='store',
+                        metavar='N',
+                        dest="jobs",
+                        type=int,
+                        default=None,
+                        help='run up to N independent operations at once.')
+
+    parser.add_argument('--runner',
+                        action='store',
+                        dest="runner",
+                        choices=["serial", "threads", "async"],
+                        default=None,
+                        help='how to run the operations (default: threads with -j, else serial).')
+
+    parser.add_argument('--volatile-keys',
+                        action='store',
+                        metavar='KEYS',
+                        dest="volatile_keys",
+                        type=lambda s: [k for k in s.split(",") if k],
+                        default=None,
+                        help='top-level .yy keys to ignore when comparing assets, '
+                             'comma-separated ("parent" always is).')
+
+    parser.add_argument('--poll',
+                        action='store_true',
+                        dest="poll",
+                        default=False,
+                        help='watch: poll for changes instead of using inotify.')
+
+    parser.add_argument('--debounce',
+                        action='store',
+                        metavar='SECONDS',
+                        dest="debounce",
+                        type=float,
+                        default=0.5,
+                        help='watch: wait for SECONDS without changes before syncing.')
+
+    parser.add_argument('--profile',
+                        action='store_true',
+                        dest="profile",
+                        default=False,
+                        help='report the time per phase and I/O counters on stderr.')
+
+    parser.add_argument('--profile-format',
+                        action='store',
+                        metavar='text|json',
+                        dest="profile_format",
+                        choices=["text", "json"],
+                        default="text",
+                        help='format of the --profile report (default: text).')
+
+    parser.add_argument('--cprofile',
+                        action='store',
+                        metavar='FILE',
+                        dest="cprofile",
+                        default=None,
+                        help='write cProfile stats of the command to FILE.')
+
+    parser.add_argument('--tracemalloc',
+                        action='store',
+                        metavar='FILE',
+                        dest="tracemalloc",
+                        default=None,
+                        help='write the top memory allocations of the command to FILE.')
+
+    parser.add_argument('--no-daemon',
+                        action='store_true',
+                        dest="no_daemon",
+                        default=False,
+                        help='run here even if a daemon (gmdm serve) is running.')
+
     parser.add_argument('-V',
                         '--verbosity',
                         action='store',
@@ -137,8 +259,11 @@ def main():
                         default="INFO",
                         help='Verbosity of output messages (default is INFO)')
 
-    args = parser.parse_args()
+    return parser
+
 
+def get_verbosity(args):
+    "Return the logging level for the parsed args"
     quiet = args.quiet
 
     verbosity = args.verbosity.upper()
@@ -152,7 +277,22 @@ def main():
         logging.CRITICAL if verbosity == "CRITICAL" else \
         logging.NOTSET if verbosity in ("NOTSET", "NONE",) else \
         logging.INFO
+    return verbosity
+
+
+def main():
+    "Main program"
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.command in FORWARDED_COMMANDS and not args.no_daemon:
+        code = forward(sys.argv[1:])
+        if code is not None:
+            sys.exit(code)
+
+    from gmdm.utils.logging import get_logger  # pylint: disable=C0415
 
+    verbosity = get_verbosity(args)
     command = args.command
     nocolors = args.nocolors
 
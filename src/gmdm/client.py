@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Forward commands to a running `gmdm serve` daemon.
+
+Only the standard library is imported here, to keep forwarded commands fast.
+"""
+import json
+import os
+import socket
+import sys
+
+from gmdm.defaults import GMDM_SOCKET_FILE, cache_dir
+
+# Commands that are run by the daemon when one is running.
+FORWARDED_COMMANDS = ("sync", "plan", "status")
+
+
+def socket_path() -> str:
+    """Return the path of the daemon socket.
+
+    "${GMDM_SOCKET}", or "gmdm.sock" in the cache directory.
+    """
+    return os.environ.get("GMDM_SOCKET") or \
+        os.path.join(cache_dir(), GMDM_SOCKET_FILE)
+
+
+def connect(path=None) -> socket.socket | None:
+    """Return a socket connected to the daemon, or None if none is running."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def forward(argv, path=None) -> int | None:
+    """Run a command line on the daemon and print its output.
+
+    Returns the exit code, or None if no daemon is running.
+    """
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as fp:
+            for line in fp:
+                msg = json.loads(line)
+                if "log" in msg:
+                    print(msg["log"], file=sys.stderr)
+                elif "stdout" in msg:
+                    sys.stdout.write(msg["stdout"])
+                    sys.stdout.flush()
+                elif "stderr" in msg:
+                    sys.stderr.write(msg["stderr"])
+                elif "exit" in msg:
+                    return msg["exit"]
+    print("The GmDm daemon closed the connection.", file=sys.stderr)
+    return 1
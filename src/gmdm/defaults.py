@@ -1,2 +1,20 @@
 # -*- coding: utf-8 -*-
+import os
+
 GMDM_FILE = "gmdm.yml"
+GMDM_CACHE_FILE = "metadata.sqlite"
+GMDM_SOCKET_FILE = "gmdm.sock"
+# In the project directory: the state of an unfinished sync.
+GMDM_STATE_DIR = ".gmdm"
+
+
+def cache_dir() -> str:
+    """Return the directory of the GmDm cache.
+
+    "${GMDM_CACHE_DIR}", or "${XDG_CACHE_HOME}/gmdm", or "~/.cache/gmdm".
+    """
+    if os.environ.get("GMDM_CACHE_DIR"):
+        return os.environ["GMDM_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "gmdm")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Set
+
+from gmdm.ops import ALL, BaseOperation
+
+logger = logging.getLogger("GmDm")
+
+
+def operation_dependencies(ops: List[BaseOperation]) -> List[Set[int]]:
+    """Return, for each operation, the indexes of earlier operations it
+    has to wait for.
+
+    Two operations depend on each other when one writes a key that the
+    other reads or writes. Every operation reads `ALL`.
+    """
+    deps = []
+    last_write = {}
+    reads_since_write = {}
+    for i, op in enumerate(ops):
+        reads = op.reads() | {ALL}
+        writes = op.writes()
+        dep = set()
+        for key in reads | writes:
+            if key in last_write:
+                dep.add(last_write[key])
+        for key in writes:
+            dep.update(reads_since_write.pop(key, ()))
+            last_write[key] = i
+        for key in reads - writes:
+            reads_since_write.setdefault(key, []).append(i)
+        deps.append(dep)
+    return deps
+
+
+class SerialExecutor:
+    """Run operations one after another."""
+
+    def __init__(self, on_done: Callable[[BaseOperation], None] | None = None):
+        self.on_done = on_done
+
+    def done(self, op):
+        if self.on_done is not None:
+            self.on_done(op)
+
+    def run(self, ops: List[BaseOperation]):
+        for op in ops:
+            op.run()
+            self.done(op)
+
+
+class ParallelExecutor(SerialExecutor):
+    """Run independent operations concurrently on a thread pool.
+
+    Operations are started as soon as the operations they depend on are
+    finished, see `operation_dependencies`. Files end up the same as with
+    `SerialExecutor`.
+    """
+
+    def __init__(self, jobs: int, on_done=None):
+        super().__init__(on_done)
+        self.jobs = jobs
+
+    def run(self, ops):
+        deps = operation_dependencies(ops)
+        dependents = [[] for _ in ops]
+        for i, dep in enumerate(deps):
+            for j in dep:
+                dependents[j].append(i)
+        waiting = [len(dep) for dep in deps]
+        ready = [i for i, n in enumerate(waiting) if n == 0]
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            running = {}
+            while ready or running:
+                # Start in plan order, for predictable progress output.
+                ready.sort(reverse=True)
+                while ready:
+                    i = ready.pop()
+                    running[executor.submit(ops[i].run)] = i
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for f in running:
+                            f.cancel()
+                        raise error
+                    self.done(ops[i])
+                    for j in dependents[i]:
+                        waiting[j] -= 1
+                        if waiting[j] == 0:
+                            ready.append(j)
+
+
+class AsyncExecutor(SerialExecutor):
+    """Run operations as coroutines on an event loop.
+
+    Operations are ordered as with `ParallelExecutor`. Their blocking calls
+    run on a thread pool, at most `jobs` at a time, and an operation waits
+    for a free slot before going on. Copies are split into one call per file.
+    At most `2 * jobs` operations are in flight.
+
+    `on_progress(done, total)` is called at most every `interval` seconds,
+    and once at the end.
+    """
+
+    def __init__(self, jobs: int, on_done=None, on_progress=None, interval=1.0):
+        super().__init__(on_done)
+        self.jobs = max(jobs, 1)
+        self.on_progress = on_progress
+        self.interval = interval
+
+    def run(self, ops):
+        asyncio.run(self._run(ops))
+
+    async def _run(self, ops):
+        deps = operation_dependencies(ops)
+        dependents = [[] for _ in ops]
+        for i, dep in enumerate(deps):
+            for j in dep:
+                dependents[j].append(i)
+        waiting = [len(dep) for dep in deps]
+        ready = [i for i, n in enumerate(waiting) if n == 0]
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.jobs)
+        done = 0
+        reported = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            async def run_blocking(fn, *args):
+                async with slots:
+                    return await loop.run_in_executor(pool, fn, *args)
+
+            running = {}
+            while ready or running:
+                ready.sort(reverse=True)
+                while ready and len(running) < 2 * self.jobs:
+                    i = ready.pop()
+                    running[asyncio.ensure_future(ops[i].run_async(run_blocking))] = i
+
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    i = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        for t in running:
+                            t.cancel()
+                        await asyncio.gather(*running, return_exceptions=True)
+                        raise error
+                    self.done(ops[i])
+                    done += 1
+                    for j in dependents[i]:
+                        waiting[j] -= 1
+                        if waiting[j] == 0:
+                            ready.append(j)
+
+                if self.on_progress is not None and \
+                        time.monotonic() - reported >= self.interval:
+                    reported = time.monotonic()
+                    self.on_progress(done, len(ops))
+
+        if self.on_progress is not None:
+            self.on_progress(done, len(ops))
+
+
+def get_executor(jobs=1, on_done=None, runner=None, on_progress=None) -> SerialExecutor:
+    """Return the executor of a runner, by default threads when jobs > 1."""
+    if runner is None:
+        runner = "threads" if jobs > 1 else "serial"
+    if runner not in ("serial", "threads", "async"):
+        raise ValueError(F"Unknown runner: \"{runner}\"")
+    if runner == "async":
+        return AsyncExecutor(jobs, on_done, on_progress)
+    if runner == "threads" and jobs > 1:
+        return ParallelExecutor(jobs, on_done)
+    return SerialExecutor(on_done)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""The graph of projects reachable through the imports of gmdm.yml files."""
+from typing import Callable, Dict, List
+
+from gmdm.ops import BaseOperation, path_key
+
+
+def topological_order(imports: Dict[str, List[str]]) -> List[str]:
+    """Return the projects, each one after the projects it imports.
+
+    `imports` maps every project to the projects it imports. Raises
+    ValueError naming the projects of a cycle.
+    """
+    order = []
+    # 1 while visiting the imports of a project, 2 when done.
+    state = {}
+    for root in imports:
+        if root in state:
+            continue
+        state[root] = 1
+        path = [root]
+        stack = [iter(imports.get(root, ()))]
+        while stack:
+            for child in stack[-1]:
+                if state.get(child) == 1:
+                    cycle = path[path.index(child):] + [child]
+                    raise ValueError("Import cycle: " + " -> ".join(cycle))
+                if child not in state:
+                    state[child] = 1
+                    path.append(child)
+                    stack.append(iter(imports.get(child, ())))
+                    break
+            else:
+                stack.pop()
+                state[path[-1]] = 2
+                order.append(path.pop())
+    return order
+
+
+class ProjectSyncOperation(BaseOperation):
+    """Sync a project of the graph.
+
+    Resources may be copied back to the imported projects, so the operation
+    writes them too: projects sharing an import are synced one at a time.
+    """
+
+    def __init__(self, directory, imports: List[str], sync: Callable, *args, **kwargs):
+        super().__init__(self, *args, **kwargs)
+        self.directory = directory
+        self.imports = imports
+        self.sync = sync
+
+    def run(self):
+        self.sync(self.directory)
+
+    def reads(self):
+        return {path_key(d) for d in self.imports}
+
+    def writes(self):
+        return {path_key(self.directory)} | self.reads()
+
+    def string(self):
+        return F"\"{self.directory}\""
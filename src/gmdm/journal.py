@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""The journal of a sync, to resume it when it is interrupted.
+
+The plan of the sync is stored in ".gmdm/sync.json" of the project
+directory, and the index of every finished operation is appended to
+".gmdm/journal". Both are removed once the sync is done.
+"""
+import contextlib
+import json
+import os
+from typing import List, Set
+
+from gmdm.defaults import GMDM_STATE_DIR
+from gmdm.models import YYProject
+from gmdm.ops import ALL, BaseOperation, ProjectSaveOperation, path_key
+from gmdm.plans import read_plan, write_plan
+from gmdm.utils.files import remove_temp_files
+
+
+def remaining_operations(ops: List[BaseOperation], done: Set[int],
+                         project: YYProject) -> List[BaseOperation]:
+    """Return the operations that still have to run.
+
+    Changes to the project only last once it is saved: unless it was,
+    the operations writing it run again.
+    """
+    key = path_key(project.path)
+    saved = any(isinstance(ops[i], ProjectSaveOperation) for i in done)
+    return [op for i, op in enumerate(ops)
+            if i not in done or (not saved and key in op.writes())]
+
+
+def remove_interrupted_writes(ops: List[BaseOperation]):
+    """Remove the temporary files of the writes of the operations."""
+    for path in set().union(*(op.writes() for op in ops)) - {ALL}:
+        if os.path.isdir(path):
+            remove_temp_files(path)
+        else:
+            remove_temp_files(os.path.dirname(path), recursive=False)
+
+
+class SyncJournal:
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, GMDM_STATE_DIR)
+        self.plan_path = os.path.join(self.directory, "sync.json")
+        self.path = os.path.join(self.directory, "journal")
+        self._fp = None
+        self._indexes = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.plan_path)
+
+    def start(self, project: YYProject, ops: List[BaseOperation], manifest=()):
+        """Store the plan of a sync, with an empty journal.
+
+        The inputs of the plan are not fingerprinted: that would read every
+        tree again, and a resumed sync runs what is left as planned.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        write_plan(self.plan_path, project, ops, manifest, inputs=False)
+        self.open(ops, "w")
+
+    def read(self):
+        """Return the stored plan and the indexes of its finished operations."""
+        plan = read_plan(self.plan_path)
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["done"])
+                    except (ValueError, KeyError):
+                        # Cut short by the interruption.
+                        break
+        return plan, done
+
+    def open(self, ops: List[BaseOperation], mode="a"):
+        """Record the operations of the plan in order as they finish."""
+        self._indexes = {id(op): i for i, op in enumerate(ops)}
+        self._fp = open(self.path, mode, encoding="utf-8")
+
+    def record(self, op: BaseOperation):
+        if self._fp is not None and id(op) in self._indexes:
+            self._fp.write(json.dumps({"done": self._indexes[id(op)]}) + "\n")
+            self._fp.flush()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def finish(self):
+        """Remove the plan and the journal of a finished sync."""
+        self.close()
+        for path in (self.path, self.plan_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        with contextlib.suppress(OSError):
+            os.rmdir(self.directory)
@@ -1,28 +1,55 @@
 # -*- coding: utf-8 -*-
+import logging
 import os
-from typing import List
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
-import json5
-
-from gmdm.utils.files import get_json_field
+from gmdm.cache import stat_key
+from gmdm.utils import parsing, yyp
+from gmdm.utils.files import atomic_write, read_yy_parent
 from gmdm.utils.strings import name_from_path
 
+logger = logging.getLogger("GmDm")
+
 
 class YYAsset:
-    def __init__(self, path: str | None = None, project=None):
+    __slots__ = ("path", "project", "entry", "_folder", "_is_loaded")
+
+    def __init__(self, path: str | None = None, project=None, entry=None):
         self.path = path
         self.project = project
-        self.real_path = None
+        # The dict of the asset in the "resources" of the project, if kept.
+        self.entry = entry
+        self._folder = None
+        self._is_loaded = False
+
+    @property
+    def real_path(self) -> str | None:
         if self.path and self.project:
-            self.real_path = os.path.dirname(
-                self.project.path) + os.sep + self.path
+            return self.project.directory + os.sep + self.path
+        return None
+
+    @property
+    def folder(self) -> str | None:
+        """The parent folder path, read from the .yy file on first access."""
+        if not self._is_loaded:
             self.load()
+        return self._folder
+
+    @folder.setter
+    def folder(self, value: str | None):
+        # Interned, as the assets of a folder share its path.
+        self._folder = sys.intern(value) if value else value
+        self._is_loaded = True
 
     def load(self):
-        if os.path.exists(self.real_path):
-            with open(self.real_path, "r", encoding="utf-8") as f:
-                data = f.read()
-            self.folder = get_json_field("parent", data)["path"]
+        real_path = self.real_path
+        if real_path and os.path.exists(real_path):
+            parent = read_yy_parent(real_path)
+            self.folder = parent.path if parent else None
+        else:
+            self._is_loaded = True
 
     @property
     def to_project_json(self):
@@ -41,8 +68,10 @@ class YYAsset:
 
 
 class YYFolder:
+    __slots__ = ("pathyy",)
+
     def __init__(self, pathyy: str):
-        self.pathyy = pathyy
+        self.pathyy = sys.intern(pathyy)
 
     @property
     def to_project_json(self):
@@ -75,79 +104,181 @@ class YYFolder:
 
 
 class YYProject:
-    def __init__(self, path):
+    def __init__(self, path, cache=None):
         self.path = path
+        self.directory = os.path.dirname(path)
+        self.cache = cache
         self.folders: List[YYFolder] = []
+        # The assets are the only record of the resources: they keep their
+        # `_data` entry, which is dropped when the project cannot be saved.
         self.resources: List[YYAsset] = []
         self._is_loaded = False
+        # Loaded from the metadata cache, only Folders and resources are set.
+        self._is_partial = False
         self._data = {}
+        # Path-keyed indexes over `_data` entries and model objects.
+        self._folder_index: Dict[str, dict] = {}
+        self._yyfolder_index: Dict[str, YYFolder] = {}
+        self._yyasset_index: Dict[str, YYAsset] = {}
+        # The entries added (or None when removed) since the file was read,
+        # by path, and the (size, mtime_ns) of the file then.
+        self._changes: Dict[str, Dict[str, dict | None]] = {"Folders": {}, "resources": {}}
+        self._stat = None
+        # Whether the arrays are in GameMaker's order, kept by new entries.
+        self._in_order: Dict[str, bool] = {}
         self.load()
 
     def load(self):
         if os.path.exists(self.path):
-            with open(self.path, "r", encoding="utf-8") as f:
-                self._data = json5.load(f)
-
-                for fdr in self._data["Folders"]:
-                    self.folders.append(YYFolder(fdr["folderPath"]))
-
-                for res in self._data["resources"]:
-                    self.resources.append(YYAsset(res["id"]["path"], self))
+            data = None
+            if self.cache is not None:
+                data = self.cache.get_project(self.path)
+            self._is_partial = data is not None
+            if data is None:
+                self._stat = stat_key(self.path)
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = parsing.load(f)
+                if self.cache is not None:
+                    self.cache.set_project(self.path, data)
+            self._data = data
+
+            for fdr in self._data["Folders"]:
+                self._folder_index[fdr["folderPath"]] = fdr
+                folder = YYFolder(fdr["folderPath"])
+                self.folders.append(folder)
+                self._yyfolder_index[folder.pathyy] = folder
+
+            keep = not self._is_partial
+            if keep:
+                self._in_order = {section: yyp.is_sorted(section, self._data[section])
+                                  for section in ("Folders", "resources")}
+            for res in self._data["resources"]:
+                asset = YYAsset(res["id"]["path"], self, res if keep else None)
+                self.resources.append(asset)
+                self._yyasset_index[asset.path] = asset
+            if not keep:
+                self._data["resources"] = None
             self._is_loaded = True
 
+    def load_assets(self, assets: List[YYAsset] | None = None, workers=1):
+        """Resolve the folders of the given assets (default: all) at once.
+
+        With more than one worker the .yy files are read on a thread pool.
+        """
+        assets = [a for a in (self.resources if assets is None else assets)
+                  if not a._is_loaded]
+        if self.cache is not None:
+            cached = self.cache.get_folders([a.real_path for a in assets])
+            for asset in assets:
+                if asset.real_path in cached:
+                    asset.folder = cached[asset.real_path]
+            assets = [a for a in assets if not a._is_loaded]
+
+        if workers > 1 and len(assets) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(YYAsset.load, assets):
+                    pass
+        else:
+            for asset in assets:
+                asset.load()
+
+        if self.cache is not None and assets:
+            self.cache.set_folders((a.real_path, a.folder) for a in assets)
+
     def save(self):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json5.dump(self._data, f, quote_keys=True, indent=2)
+        """Write the project.
+
+        When the file is unchanged since it was read, only the added and
+        removed entries are written into its text, see `yyp.patch_project`.
+        """
+        if self._is_partial:
+            raise RuntimeError(
+                self.path + " was loaded from the cache and cannot be saved.")
+        text = None
+        if self._stat is not None and self._stat == stat_key(self.path):
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                original = f.read()
+            try:
+                text = yyp.patch_project(original, self._changes)
+            except ValueError as e:
+                logger.debug(F"{self.path}: {e}, writing the whole project.")
+            else:
+                if text == original:
+                    return True
+        if text is None:
+            text = parsing.dumps(self._data)
+            if self._line_ending() == "\r\n":
+                text = text.replace("\n", "\r\n")
+        with atomic_write(self.path, encoding="utf-8", newline="") as f:
+            f.write(text)
+        self._stat = stat_key(self.path)
+        self._changes = {"Folders": {}, "resources": {}}
         return True
 
+    def _line_ending(self) -> str:
+        """Return the line ending of the file, or the platform's for a new one."""
+        try:
+            with open(self.path, "rb") as f:
+                line = f.readline()
+        except FileNotFoundError:
+            return os.linesep
+        return "\r\n" if line.endswith(b"\r\n") else "\n"
+
     def get_folder(self, pathyy: str) -> dict | None:
-        for fdr in self._data["Folders"]:
-            if pathyy == fdr["folderPath"]:
-                return fdr
-        return None
+        return self._folder_index.get(pathyy)
 
     def add_folder(self, dic: dict):
-        self._data["Folders"].append(
-            dic
-        )
+        old = self._folder_index.get(dic["folderPath"])
+        if old is not None:
+            self._data["Folders"].remove(old)
+        yyp.insert_entry("Folders", self._data["Folders"], dic,
+                         self._in_order.get("Folders", False))
+        self._folder_index[dic["folderPath"]] = dic
+        self._changes["Folders"][dic["folderPath"]] = dic
 
     def remove_folder(self, dic: dict, all=False):
-        fdr_path = dic["folderPath"]
-        fdr_path = fdr_path[:-3]
-        _f = False
-        for i in range(len(self._data["Folders"])):
-            if dic["folderPath"] == self._data["Folders"][i]["folderPath"]:
-                del self._data["Folders"][i]
-                _f = True
-                break
-
-        if all and _f:
-            _ff = True
-            while _ff:
-                _f = False
-                for i in range(len(self._data["Folders"])):
-                    if self._data["Folders"][i]["folderPath"].startswith(fdr_path) \
-                            and fdr_path != self._data["Folders"][i]["folderPath"][:-3]:
-                        self.remove_folder(
-                            {"folderPath": self._data["Folders"][i]["folderPath"]})
-                        _f = True
-                        break
-                if not _f:
-                    _ff = False
+        fdr = self._folder_index.pop(dic["folderPath"], None)
+        if fdr is None:
+            return
+        self._data["Folders"].remove(fdr)
+        self._changes["Folders"][dic["folderPath"]] = None
+
+        if all:
+            fdr_path = dic["folderPath"][:-3]
+            for path in [p for p in self._folder_index
+                         if p.startswith(fdr_path) and p[:-3] != fdr_path]:
+                self.remove_folder({"folderPath": path})
 
     def get_resource(self, path: str) -> dict | None:
-        for res in self._data["resources"]:
-            if res["id"]["path"] == path:
-                return res
-        return None
+        asset = self._yyasset_index.get(path)
+        if asset is None:
+            return None
+        return asset.entry if asset.entry is not None else asset.to_project_json
 
     def add_resource(self, dic: dict):
-        self._data["resources"].append(
-            dic
-        )
+        path = dic["id"]["path"]
+        asset = self._yyasset_index.get(path)
+        if asset is None:
+            asset = YYAsset(path, self)
+            self.resources.append(asset)
+            self._yyasset_index[path] = asset
+        elif asset.project is self and asset.entry is not None \
+                and self._data["resources"] is not None:
+            self._data["resources"].remove(asset.entry)
+        asset.entry = dic
+        self._changes["resources"][path] = dic
+        if self._data["resources"] is not None:
+            yyp.insert_entry("resources", self._data["resources"], dic,
+                             self._in_order.get("resources", False))
 
     def remove_resource(self, dic: dict):
-        self._data.remove(self.get_resource(dic["id"]["path"]))
+        asset = self._yyasset_index.pop(dic["id"]["path"], None)
+        if asset is None:
+            return
+        self.resources.remove(asset)
+        self._changes["resources"][asset.path] = None
+        if asset.entry is not None and self._data["resources"] is not None:
+            self._data["resources"].remove(asset.entry)
 
     def contains_yyfolder(self, folder: YYFolder) -> bool:
         return self.get_yyfolder(folder.pathyy) is not None
@@ -160,57 +291,40 @@ class YYProject:
             raise FileNotFoundError(
                 self.path + " is not loaded. Perhaps it doesn't exist?")
 
-        for folder in self.folders:
-            if path == folder.pathyy:
-                return folder
-        return None
+        return self._yyfolder_index.get(path)
 
     def add_yyfolder(self, folder: YYFolder):
         if not self.contains_yyfolder(folder):
             self.folders.append(folder)
+            self._yyfolder_index[folder.pathyy] = folder
             self.add_folder(folder.to_project_json)
 
     def remove_yyfolder(self, folder: YYFolder, all=False):
         if self.contains_yyfolder(folder):
-            for i, val in enumerate(self.folders):
-                if val.pathyy == folder.pathyy:
-                    del self.folders[i]
-                    break
+            self.folders.remove(self._yyfolder_index.pop(folder.pathyy))
             self.remove_folder(folder.to_project_json, all)
 
             if all:
-                _ff = True
-                while _ff:
-                    _f = False
-                    for i, val in enumerate(self.folders):
-                        if val.pathyy.startswith(folder.pathyy[:-3]):
-                            self.remove_yyfolder(val)
-                            _f = True
-                    if not _f:
-                        _ff = False
+                fdr_path = folder.pathyy[:-3]
+                for path in [p for p in self._yyfolder_index
+                             if p.startswith(fdr_path)]:
+                    self.remove_yyfolder(self._yyfolder_index[path])
 
     def get_yyasset(self, path: str) -> YYAsset | None:
         if not self._is_loaded:
             raise FileNotFoundError(
                 self.path + " is not loaded. Perhaps it doesn't exist?")
 
-        for resource in self.resources:
-            if path in (resource.path, resource.path):
-                return resource
-        return None
+        return self._yyasset_index.get(path)
 
     def add_yyasset(self, resource: YYAsset):
         if not self.contains_yyasset(resource):
             self.resources.append(resource)
+            self._yyasset_index[resource.path] = resource
             self.add_resource(resource.to_project_json)
 
     def remove_yyasset(self, resource: YYAsset):
         if self.contains_yyasset(resource):
-            for i, val in enumerate(self.resources):
-                if val.path == resource.path:
-                    del self.resources[i]
-                    break
-
             self.remove_resource(resource.to_project_json)
 
     def __str__(self) -> str:
@@ -1,15 +1,42 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 import os
 import shutil
 
-import json5
-
-from gmdm.models import YYFolder
+from gmdm.models import YYAsset, YYFolder
+from gmdm.utils import parsing
 from gmdm.utils.dicts import dotset
+from gmdm.utils.files import atomic_write, copy_file, is_same_file
 
 logger = logging.getLogger("GmDm")
 
+ALL = "*"
+
+
+def path_key(path) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def write_json_updates(src, dst, updates) -> int | None:
+    """Write src with the (dot path, value) updates applied to dst.
+
+    Returns the number of bytes written, or None if dst already had the
+    same content.
+    """
+    with open(src, "r", encoding="utf-8") as fp:
+        jsono = parsing.load(fp)
+    for item, value in updates:
+        dotset(jsono, item, value)
+    data = parsing.dumps(jsono)
+    if os.path.exists(dst):
+        with open(dst, "r", encoding="utf-8") as fp:
+            if fp.read() == data:
+                return None
+    with atomic_write(dst, encoding="utf-8") as fp:
+        fp.write(data)
+    return len(data.encode("utf-8"))
+
 
 class BaseOperation:
     def __init__(self, *args, **kwargs):
@@ -19,6 +46,18 @@ class BaseOperation:
     def run(self):
         pass
 
+    async def run_async(self, run_blocking):
+        """Run from `AsyncExecutor`, blocking calls go through run_blocking."""
+        await run_blocking(self.run)
+
+    def reads(self) -> set:
+        """Keys (normalized paths) this operation reads."""
+        return set()
+
+    def writes(self) -> set:
+        """Keys this operation writes, `ALL` orders it against everything."""
+        return {ALL}
+
     def string(self):
         return ""
 
@@ -32,25 +71,118 @@ class BaseOperation:
     def __str__(self):
         return F"{self.get_name()}: " + self.string()
 
+    def to_dict(self) -> dict:
+        """Return a serializable description, see `operation_from_dict`."""
+        dic = {"op": self.__class__.__name__[:-9]}
+        if hasattr(self, "name"):
+            dic["name"] = self.name
+        return dic
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        raise NotImplementedError
+
+
+def _is_selected(rel, selected) -> bool:
+    """Return True if the relative path or one of its directories is selected."""
+    if rel in selected:
+        return True
+    parts = rel.split("/")
+    return any("/".join(parts[:i]) in selected for i in range(1, len(parts)))
+
 
 class CopyDirectoryOperation(BaseOperation):
-    def __init__(self, _from, to, *args, **kwargs):
+    def __init__(self, _from, to, *args, files=None, **kwargs):
         super().__init__(self, *args, **kwargs)
         self._from = _from
         self.to = to
+        # Relative paths of the files (or directories) to copy, default all,
+        # see `DirectoryDiff.copied`.
+        self.files = files
+        # JSON updates to write in place of plain copies, by relative
+        # path, see JsonWriteBuffer.
+        self.json_updates = {}
+        # Set by run()
+        self.files_copied = None
+        self.bytes_copied = None
+
+    def _walk(self):
+        """Make the destination directories.
+
+        Returns the (src, dst, JSON updates) of every file, the (src, dst)
+        directories and the updates of files that are not in the source.
+        """
+        pending = dict(self.json_updates)
+        selected = None if self.files is None else set(self.files)
+        files = []
+        dirs = []
+        for root, _, names in os.walk(self._from):
+            dst_root = os.path.join(self.to, os.path.relpath(root, self._from))
+            os.makedirs(dst_root, exist_ok=True)
+            dirs.append((root, dst_root))
+            for name in names:
+                src = os.path.join(root, name)
+                rel = os.path.relpath(src, self._from).replace(os.sep, "/")
+                if selected is not None and not _is_selected(rel, selected):
+                    continue
+                updates = pending.pop(rel, None)
+                files.append((src, os.path.join(dst_root, name), updates))
+        return files, dirs, pending
+
+    @staticmethod
+    def _copy(src, dst, updates) -> int | None:
+        """Copy a file if it differs, return the bytes written or None."""
+        if updates is not None:
+            return write_json_updates(src, dst, updates)
+        if is_same_file(src, dst):
+            return None
+        return copy_file(src, dst)
+
+    def _finish(self, written, dirs, pending):
+        self.files_copied = sum(1 for n in written if n is not None)
+        self.bytes_copied = sum(n for n in written if n is not None)
+        # Deepest first, as making a directory changes its parent.
+        for root, dst_root in reversed(dirs):
+            shutil.copystat(root, dst_root)
 
-    def force_copy(self, src, dst):
-        if os.path.exists(dst):
-            os.remove(dst)
-        shutil.copy2(src, dst)
+        # Updates of files that are not in the source.
+        for name, updates in pending.items():
+            dst = os.path.join(self.to, name)
+            if os.path.exists(dst):
+                write_json_updates(dst, dst, updates)
 
     def run(self):
-        os.makedirs(os.path.dirname(self.to), exist_ok=True)
-        shutil.copytree(self._from, self.to,
-                        copy_function=self.force_copy, dirs_exist_ok=True)
+        """Copy the files that differ from the destination."""
+        files, dirs, pending = self._walk()
+        self._finish([self._copy(*f) for f in files], dirs, pending)
+
+    async def run_async(self, run_blocking):
+        """Like `run`, with the files copied concurrently."""
+        files, dirs, pending = await run_blocking(self._walk)
+        written = await asyncio.gather(*(run_blocking(self._copy, *f) for f in files))
+        await run_blocking(self._finish, written, dirs, pending)
+
+    def reads(self):
+        return {path_key(self._from)}
+
+    def writes(self):
+        return {path_key(self.to)}
 
     def string(self):
-        return F"\"{self._from}\" -> \"{self.to}\""
+        s = F"\"{self._from}\" -> \"{self.to}\""
+        if self.files_copied is not None:
+            s += F" ({self.files_copied} files, {self.bytes_copied} bytes)"
+        return s
+
+    def to_dict(self):
+        dic = {**super().to_dict(), "from": self._from, "to": self.to}
+        if self.files is not None:
+            dic["files"] = self.files
+        return dic
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        return cls(dic["from"], dic["to"], files=dic.get("files"), **_name_kwargs(dic))
 
 
 class AddFolderOperation(BaseOperation):
@@ -73,9 +205,21 @@ class AddFolderOperation(BaseOperation):
         self.project.add_yyfolder(self.folder)
         return True
 
+    def writes(self):
+        return {path_key(self.project.path)}
+
     def string(self):
         return F"{self.folder} to {self.project}"
 
+    def to_dict(self):
+        return {**super().to_dict(), "project": self.project.path,
+                "folder": self.folder.pathyy}
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        return cls(projects[dic["project"]], YYFolder(dic["folder"]),
+                   **_name_kwargs(dic))
+
 
 class AddAssetOperation(BaseOperation):
     def __init__(self, project, asset, *args, **kwargs):
@@ -87,29 +231,55 @@ class AddAssetOperation(BaseOperation):
         self.project.add_yyasset(self.asset)
         return True
 
+    def writes(self):
+        return {path_key(self.project.path)}
+
     def string(self):
         return F"{self.asset} to {self.project}"
 
+    def to_dict(self):
+        return {**super().to_dict(), "project": self.project.path,
+                "asset": self.asset.path}
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        project = projects[dic["project"]]
+        return cls(project, YYAsset(dic["asset"], project), **_name_kwargs(dic))
+
 
 class JsonModifyOperation(BaseOperation):
     def __init__(self, fpath, dic, *args, **kwargs):
         super().__init__(self, *args, **kwargs)
         self.fpath = fpath
         self.dic = dic
+        # Set by JsonWriteBuffer: the updates of every buffered operation
+        # on this file, or [] when another operation writes them.
+        self.buffered = None
 
     def run(self):
-        with open(self.fpath, "r", encoding="utf-8") as fp:
-            jsono = json5.load(fp, encoding="utf-8")
-        for item in self.dic:
-            dotset(jsono, item, self.dic[item])
-        with open(self.fpath, "w", encoding="utf-8") as fp:
-            json5.dump(jsono, fp, quote_keys=True, indent=2)
+        if self.buffered is None:
+            updates = list(self.dic.items())
+        else:
+            updates = self.buffered
+        if updates:
+            write_json_updates(self.fpath, self.fpath, updates)
+
+    def writes(self):
+        # The whole asset directory, as copies work on directories.
+        return {path_key(os.path.dirname(self.fpath))}
 
     def string(self):
         if logger.level == logging.DEBUG:
             return F"\"{self.fpath}\": (" + ",".join([f"{x}={self.dic[x]}" for x in list(self.dic)]) + ")"
         return F"\"{self.fpath}\""
 
+    def to_dict(self):
+        return {**super().to_dict(), "file": self.fpath, "values": self.dic}
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        return cls(dic["file"], dic["values"], **_name_kwargs(dic))
+
 
 class ProjectSaveOperation(BaseOperation):
     def __init__(self, project, *args, **kwargs):
@@ -119,5 +289,91 @@ class ProjectSaveOperation(BaseOperation):
     def run(self):
         self.project.save()
 
+    def writes(self):
+        # After every other operation: the project only refers to assets
+        # that are copied.
+        return {path_key(self.project.path), ALL}
+
     def string(self) -> str:
         return F"{self.project}"
+
+    def to_dict(self):
+        return {**super().to_dict(), "project": self.project.path}
+
+    @classmethod
+    def from_dict(cls, dic, projects):
+        return cls(projects[dic["project"]], **_name_kwargs(dic))
+
+
+class JsonWriteBuffer:
+    """Gathers the JSON modifications of a plan per file, so that each file
+    is written once.
+
+    Consecutive modifications of a file are written together by the last of
+    them. If the asset directory was copied just before, the copy writes the
+    file in its final state instead. Any other operation touching the
+    directory in between ends the group.
+    """
+
+    def __init__(self, ops: list):
+        self.saved_writes = 0
+        groups = {}
+        last_copy = {}
+        for op in ops:
+            if isinstance(op, JsonModifyOperation):
+                fkey = path_key(op.fpath)
+                dkey = path_key(os.path.dirname(op.fpath))
+                if fkey not in groups:
+                    groups[fkey] = (dkey, last_copy.get(dkey), [])
+                groups[fkey][2].append(op)
+                continue
+
+            touched = op.reads() | op.writes()
+            for fkey in list(groups):
+                if ALL in touched or groups[fkey][0] in touched:
+                    self._flush(*groups.pop(fkey)[1:])
+            if ALL in touched:
+                last_copy.clear()
+            for key in touched:
+                last_copy.pop(key, None)
+            if isinstance(op, CopyDirectoryOperation):
+                last_copy[path_key(op.to)] = op
+
+        for _, copy, mods in groups.values():
+            self._flush(copy, mods)
+
+    def _flush(self, copy, mods):
+        updates = [item for op in mods for item in op.dic.items()]
+        for op in mods:
+            op.buffered = []
+        if copy is not None:
+            name = os.path.relpath(os.path.abspath(mods[0].fpath),
+                                   os.path.abspath(copy.to))
+            copy.json_updates[name.replace(os.sep, "/")] = updates
+            self.saved_writes += len(mods)
+        else:
+            mods[-1].buffered = updates
+            self.saved_writes += len(mods) - 1
+
+
+def _name_kwargs(dic):
+    return {"name": dic["name"]} if "name" in dic else {}
+
+
+OPERATIONS = {
+    cls.__name__[:-9]: cls for cls in (
+        CopyDirectoryOperation,
+        AddFolderOperation,
+        AddAssetOperation,
+        JsonModifyOperation,
+        ProjectSaveOperation,
+    )
+}
+
+
+def operation_from_dict(dic, projects) -> BaseOperation:
+    """Build an operation from `BaseOperation.to_dict` output.
+
+    `projects` maps project paths to loaded `YYProject`s.
+    """
+    return OPERATIONS[dic["op"]].from_dict(dic, projects)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Plan optimization between planning and execution."""
+import logging
+from typing import List
+
+from gmdm.ops import (ALL, AddAssetOperation, AddFolderOperation,
+                      BaseOperation, CopyDirectoryOperation,
+                      ProjectSaveOperation, path_key)
+
+logger = logging.getLogger("GmDm")
+
+
+def dedupe_folders(ops: List[BaseOperation]) -> List[BaseOperation]:
+    """Drop AddFolderOperations of a folder that is already added."""
+    added = set()
+    result = []
+    for op in ops:
+        if isinstance(op, AddFolderOperation):
+            key = (path_key(op.project.path), op.folder.pathyy)
+            if key in added:
+                continue
+            added.add(key)
+        result.append(op)
+    return result
+
+
+def drop_superseded_copies(ops: List[BaseOperation]) -> List[BaseOperation]:
+    """Drop copies that are repeated later with nothing touching either
+    directory in between."""
+    dropped = set()
+    # (from, to) -> index of the last copy not yet superseded.
+    pending = {}
+    for i, op in enumerate(ops):
+        key = None
+        if isinstance(op, CopyDirectoryOperation):
+            key = (path_key(op._from), path_key(op.to))
+            if key in pending:
+                dropped.add(pending[key])
+                # The files of both copies.
+                earlier = ops[pending[key]].files
+                if earlier is None or op.files is None:
+                    op.files = None
+                else:
+                    op.files = list(dict.fromkeys(earlier + op.files))
+        # Other copies, in either direction, touch the directories too.
+        touched = op.reads() | op.writes()
+        for other in list(pending):
+            if other != key and (ALL in touched or other[0] in touched
+                                 or other[1] in touched):
+                del pending[other]
+        if key is not None:
+            pending[key] = i
+    return [op for i, op in enumerate(ops) if i not in dropped]
+
+
+def merge_saves(ops: List[BaseOperation]) -> List[BaseOperation]:
+    """Save every project once, at the end of the plan.
+
+    The project then only refers to asset directories that were copied.
+    """
+    projects = {}
+    result = []
+    for op in ops:
+        if isinstance(op, (AddFolderOperation, AddAssetOperation,
+                           ProjectSaveOperation)):
+            projects.setdefault(path_key(op.project.path), op.project)
+        if not isinstance(op, ProjectSaveOperation):
+            result.append(op)
+    result.extend(ProjectSaveOperation(project) for project in projects.values())
+    return result
+
+
+PASSES = (
+    dedupe_folders,
+    # Saves are moved out of the way of the copies first.
+    merge_saves,
+    drop_superseded_copies,
+)
+
+
+def optimize_operations(ops: List[BaseOperation]) -> List[BaseOperation]:
+    """Run the optimization passes over a plan and log what they removed."""
+    count = len(ops)
+    for optimize in PASSES:
+        before = len(ops)
+        ops = optimize(ops)
+        if before != len(ops):
+            logger.debug(F"{optimize.__name__}: {before - len(ops)} operations removed.")
+    if count != len(ops):
+        logger.info(F"Plan optimizer removed {count - len(ops)} of {count} operations.")
+    return ops
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Sync plans that are written by `gmdm plan` and executed by `gmdm apply`."""
+import json
+import os
+from typing import Dict, List
+
+from gmdm.models import YYProject
+from gmdm.ops import ALL, BaseOperation, operation_from_dict
+from gmdm.utils.files import atomic_write, fingerprint
+
+PLAN_VERSION = 1
+
+
+def plan_inputs(ops: List[BaseOperation], project: YYProject) -> Dict[str, str | None]:
+    """Return the fingerprints of every path the operations read or write."""
+    paths = {os.path.abspath(project.path)}
+    for op in ops:
+        paths.update(op.reads() | op.writes())
+    paths.discard(ALL)
+    return {path: fingerprint(path) for path in sorted(paths)}
+
+
+def changed_inputs(fingerprints: Dict[str, str | None]) -> List[str]:
+    return [path for path, fp in fingerprints.items() if fingerprint(path) != fp]
+
+
+def write_plan(fpath, project: YYProject, ops: List[BaseOperation], manifest=(),
+               inputs=True):
+    """Write a plan for the project.
+
+    With `inputs`, the fingerprints of every path it reads or writes are
+    added, see `changed_inputs`.
+    """
+    plan = {
+        "version": PLAN_VERSION,
+        "cwd": os.getcwd(),
+        "project": os.path.abspath(project.path),
+        "manifest": [list(pair) for pair in manifest],
+        "operations": [op.to_dict() for op in ops],
+    }
+    if inputs:
+        plan["inputs"] = plan_inputs(ops, project)
+    data = json.dumps(plan, separators=(",", ":"))
+    if fpath == "-":
+        print(data)
+    else:
+        with atomic_write(fpath, encoding="utf-8") as f:
+            f.write(data)
+
+
+def read_plan(fpath) -> dict:
+    with open(fpath, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(F"\"{fpath}\" is not a supported plan file.")
+    return plan
+
+
+def plan_operations(plan: dict, project: YYProject) -> List[BaseOperation]:
+    """Build the operations of a plan. Paths are relative to plan["cwd"]."""
+    projects = {project.path: project, plan["project"]: project}
+    return [operation_from_dict(dic, projects) for dic in plan["operations"]]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Timings and counters of a run, see `--profile`.
+
+The helpers do nothing unless a `Profile` is active, so they can be called
+from any stage.
+"""
+import contextlib
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List
+
+_active = None
+
+
+class Profile:
+    """Wall time per phase and per import, and counters."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.imports: Dict[str, float] = {}
+        self.counters = Counter()
+        # What the report leaves out, e.g. counters this platform lacks.
+        self.notes: List[str] = []
+        self.total = None
+        self._lock = threading.Lock()
+
+    def add_time(self, group: dict, name, seconds):
+        with self._lock:
+            group[name] = group.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def report(self) -> dict:
+        return {
+            "total": self.total,
+            "phases": self.phases,
+            "imports": self.imports,
+            "counters": dict(sorted(self.counters.items())),
+            "notes": self.notes,
+        }
+
+    def summary(self) -> str:
+        lines = [F"{'Phase':<40}{'Seconds':>10}"]
+        for name, seconds in self.phases.items():
+            lines.append(F"{name:<40}{seconds:>10.3f}")
+        lines.append(F"{'total':<40}{self.total:>10.3f}")
+        if self.imports:
+            lines.append("")
+            lines.append(F"{'Import':<40}{'Seconds':>10}")
+            for name, seconds in self.imports.items():
+                lines.append(F"{name[-40:]:<40}{seconds:>10.3f}")
+        lines.append("")
+        lines.append(F"{'Counter':<40}{'Value':>10}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(F"{name:<40}{value:>10}")
+        if self.notes:
+            lines.append("")
+            lines.extend(F"Note: {note}" for note in self.notes)
+        return "\n".join(lines)
+
+
+def active() -> Profile | None:
+    return _active
+
+
+def count(name, n=1):
+    """Add n to a counter of the active profile."""
+    if _active is not None:
+        _active.count(name, n)
+
+
+@contextlib.contextmanager
+def _timed(group_name, name):
+    profile = _active
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(getattr(profile, group_name), name,
+                         time.perf_counter() - start)
+
+
+def phase(name):
+    """Time a phase, times of the same phase add up."""
+    return _timed("phases", name)
+
+
+def import_phase(path):
+    """Time the planning of an import."""
+    return _timed("imports", path)
+
+
+def _proc_io() -> Dict[str, int]:
+    """Return the bytes read and written by this process, where known.
+
+    They are read from /proc/self/io, on Linux only.
+    """
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return {}
+    return {"bytes_read": int(fields["rchar"]), "bytes_written": int(fields["wchar"])}
+
+
+@contextlib.contextmanager
+def profiled(cprofile_file=None, tracemalloc_file=None):
+    """Activate a new profile for the duration of the block.
+
+    Optionally capture cProfile stats (of the calling thread) or the top
+    memory allocations to the given files.
+    """
+    global _active
+    profile = Profile()
+    profiler = cProfile.Profile() if cprofile_file else None
+    if tracemalloc_file:
+        tracemalloc.start()
+    io_start = _proc_io()
+    if not io_start:
+        profile.notes.append(
+            "bytes_read and bytes_written are not available, "
+            "they are read from /proc/self/io (Linux only).")
+    start = time.perf_counter()
+    _active = profile
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _active = None
+        profile.total = time.perf_counter() - start
+        for key, value in _proc_io().items():
+            profile.counters[key] = value - io_start[key]
+        if profiler is not None:
+            profiler.dump_stats(cprofile_file)
+        if tracemalloc_file:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(tracemalloc_file, "w", encoding="utf-8") as f:
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(F"{stat}\n")
+
+
+def format_report(profile: Profile, fmt="text") -> str:
+    if fmt == "json":
+        return json.dumps(profile.report(), indent=2)
+    return profile.summary()
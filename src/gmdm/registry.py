@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+from typing import Dict, List
+
+from gmdm.models import YYProject
+
+
+def default_import_dirs() -> List[str]:
+    """Return the directories to find imported projects in, by priority.
+
+    "${GMDM_IMPORT_DIRS}" in order, then "" for the path as given (absolute,
+    or relative to the working directory), then the GameMaker projects
+    directory.
+    """
+    dirs = [p for p in (os.environ.get("GMDM_IMPORT_DIRS") or "").split(os.pathsep) if p]
+    dirs.append("")
+    dirs.append(os.path.expanduser('~') + '/Documents/GameMakerStudio2/Projects')
+    return list(dict.fromkeys(dirs))
+
+
+class ImportResolver:
+    """Finds imported projects by their path in gmdm.yml.
+
+    The directories are tried in order, see `default_import_dirs`. Each one
+    is listed once and every result is remembered. Paths as given are
+    relative to `base`, or to the working directory.
+    """
+
+    def __init__(self, dirs: List[str] | None = None, base=None):
+        self.dirs = default_import_dirs() if dirs is None else dirs
+        self.base = base
+        self._listings: Dict[str, set] = {}
+        self._resolved: Dict[str, str | None] = {}
+
+    def _listing(self, directory) -> set:
+        if directory not in self._listings:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                names = []
+            self._listings[directory] = {os.path.normcase(n) for n in names}
+        return self._listings[directory]
+
+    def _is_listed(self, path) -> bool:
+        """Return whether the listing of its directory has the path."""
+        parent, base = os.path.split(os.path.normpath(path))
+        if base in ("", os.curdir, os.pardir):
+            return True
+        return os.path.normcase(base) in self._listing(parent or os.curdir)
+
+    def resolve(self, name) -> str | None:
+        """Return the path of the project directory, or None."""
+        if name in self._resolved:
+            return self._resolved[name]
+
+        path = None
+        for directory in self.dirs:
+            if directory == "":
+                given = name if self.base is None else os.path.join(self.base, name)
+            elif os.path.isabs(name):
+                continue
+            else:
+                given = directory + os.sep + name
+            if self._is_listed(given) and os.path.exists(given):
+                path = given
+                break
+        self._resolved[name] = path
+        return path
+
+
+class ProjectRegistry:
+    """The projects of a run, each .yyp is loaded once.
+
+    Projects are loaded through the metadata cache and, in the daemon, taken
+    from its `ProjectPool`. A writable project, one that is saved by the
+    run, is always read from its file.
+    """
+
+    def __init__(self, cache=None, pool=None):
+        self.cache = cache
+        self.pool = pool
+        self._projects: Dict[str, YYProject] = {}
+        self._writable = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, path):
+        return os.path.normcase(os.path.abspath(path)) in self._projects
+
+    def get(self, path, writable=False) -> YYProject:
+        key = os.path.normcase(os.path.abspath(path))
+        with self._lock:
+            project = self._projects.get(key)
+            if project is not None and (not writable or key in self._writable):
+                return project
+
+            if writable:
+                project = YYProject(path)
+                self._writable.add(key)
+            elif self.pool is not None:
+                project = self.pool.get(path, self.cache)
+            else:
+                project = YYProject(path, self.cache)
+            self._projects[key] = project
+            return project
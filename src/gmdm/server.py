@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""The `gmdm serve` daemon.
+
+Commands are sent as a single JSON line {"argv", "cwd", "env"} over a Unix
+socket. The daemon answers with JSON lines: {"log": str}, {"stdout": str} and
+{"stderr": str} while running, then {"exit": int}. Requests are run one at a time.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, NamedTuple, Tuple
+
+from gmdm.app import App
+from gmdm.cache import stat_key
+from gmdm.cli import build_parser, get_verbosity
+from gmdm.client import connect, socket_path
+from gmdm.models import YYProject
+
+logger = logging.getLogger("GmDm")
+
+
+class _PooledProject(NamedTuple):
+    stat: Tuple[int, int] | None
+    project: YYProject
+    # Stat of the asset files when their folders were last checked.
+    assets: Dict[str, Tuple[int, int] | None]
+
+
+class ProjectPool:
+    """Loaded projects kept between requests.
+
+    A project is loaded again when its .yyp file changes, and the folders of
+    its assets are read again when their .yy files change.
+    """
+
+    def __init__(self):
+        self._projects: Dict[str, _PooledProject] = {}
+        self.hits = 0
+        self.loads = 0
+
+    def __len__(self):
+        return len(self._projects)
+
+    def get(self, path, cache=None) -> YYProject:
+        key = os.path.abspath(path)
+        stat = stat_key(path)
+        pooled = self._projects.get(key)
+        if pooled is None or pooled.stat != stat or pooled.project.path != path:
+            self.loads += 1
+            pooled = _PooledProject(stat, YYProject(path, cache), {})
+            self._projects[key] = pooled
+            return pooled.project
+
+        self.hits += 1
+        project = pooled.project
+        project.cache = cache
+        for asset in project.resources:
+            asset_stat = stat_key(asset.real_path)
+            if asset._is_loaded and pooled.assets.get(asset.real_path) != asset_stat:
+                asset._is_loaded = False
+            pooled.assets[asset.real_path] = asset_stat
+        return project
+
+
+def _is_console_handler(handler) -> bool:
+    return isinstance(handler, logging.StreamHandler) and \
+        not isinstance(handler, logging.FileHandler)
+
+
+class _SocketLogHandler(logging.Handler):
+    def __init__(self, send, level):
+        super().__init__(level)
+        self.send = send
+        self.setFormatter(logging.Formatter(
+            '%(asctime)s,%(msecs)03d %(name)s.%(levelname)-8s %(message)s',
+            '%d-%b-%y %H:%M:%S'))
+
+    def emit(self, record):
+        try:
+            self.send({"log": self.format(record)})
+        except OSError:
+            pass
+
+
+class _SocketStream(io.TextIOBase):
+    def __init__(self, send, name):
+        self.send = send
+        self.name = name
+
+    def write(self, s):
+        if s:
+            self.send({self.name: s})
+        return len(s)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        lock = threading.Lock()
+
+        def send(msg):
+            # Operations may log from several threads.
+            data = json.dumps(msg).encode("utf-8") + b"\n"
+            with lock:
+                self.wfile.write(data)
+                self.wfile.flush()
+
+        try:
+            code = self.server.daemon.run_request(json.loads(line), send)
+            send({"exit": code})
+        except OSError:
+            # The client went away.
+            pass
+
+
+class Daemon:
+    """Runs forwarded commands with projects kept in memory."""
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.parser = build_parser()
+        self.projects = ProjectPool()
+        self.started = time.time()
+        self.requests = 0
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "socket": self.path,
+            "uptime": round(time.time() - self.started, 3),
+            "requests": self.requests,
+            "projects": len(self.projects),
+            "project_hits": self.projects.hits,
+            "project_loads": self.projects.loads,
+        }
+
+    def run_request(self, request, send) -> int:
+        """Run a forwarded command line, streaming its output with send."""
+        self.requests += 1
+        try:
+            args = self.parser.parse_args(request["argv"])
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 2
+
+        if args.command == "status":
+            send({"stdout": json.dumps(self.status(), indent=2) + "\n"})
+            return 0
+
+        handler = _SocketLogHandler(send, get_verbosity(args))
+        # The console handlers of the daemon write to sys.stderr, which is
+        # sent to the client: only the request's verbosity is logged.
+        handlers = [h for h in logger.handlers if _is_console_handler(h)]
+        level = logger.level
+        environ = dict(os.environ)
+        cwd = os.getcwd()
+        for console in handlers:
+            logger.removeHandler(console)
+        logger.addHandler(handler)
+        # NOTSET logs everything, as without the daemon.
+        logger.setLevel(handler.level or 1)
+        try:
+            os.environ.clear()
+            os.environ.update(request["env"])
+            os.chdir(request["cwd"])
+            app = App(logger)
+            app.projects = self.projects
+            with contextlib.redirect_stdout(_SocketStream(send, "stdout")), \
+                    contextlib.redirect_stderr(_SocketStream(send, "stderr")):
+                code = app.run(args)
+        except Exception as e:  # pylint: disable=W0703
+            logger.exception(e)
+            code = 1
+        finally:
+            logger.removeHandler(handler)
+            for console in handlers:
+                logger.addHandler(console)
+            logger.setLevel(level)
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+        if code is None or code is False:
+            return 0
+        return 1 if code is True else int(code)
+
+    def serve(self) -> int:
+        if not hasattr(socket, "AF_UNIX"):
+            logger.error("The daemon needs Unix domain sockets.")
+            return 1
+
+        sock = connect(self.path)
+        if sock is not None:
+            sock.close()
+            logger.error(F"A daemon is already listening on \"{self.path}\".")
+            return 1
+        if os.path.exists(self.path):
+            # Left by a daemon that did not exit cleanly.
+            os.remove(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # Only the user may connect, requests run with their permissions.
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.UnixStreamServer(self.path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        with server:
+            server.daemon = self
+            logger.info(F"Listening on \"{self.path}\". Press Ctrl+C to stop.")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(self.path)
+        return 0
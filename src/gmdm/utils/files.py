@@ -1,29 +1,222 @@
 # -*- coding: utf-8 -*-
+import contextlib
 import filecmp
+import hashlib
+import json
 import os
 import re
+import shutil
+import stat
+import sys
+from typing import Dict, List, NamedTuple
 
-import json5
 import yaml
 
+from gmdm import profiling
+from gmdm.utils import parsing
 
-def get_json_field(field, string):
-    match = re.search(rf'"{field}":\s*', string)
-    if match:
-        start = match.span()[0]
-        dstr = string[start:]
-        s = 0
-        end = start+1
-        for i, c in enumerate(dstr):
-            if c == '{':
-                s += 1
-            elif c == '}':
-                s -= 1
-                if s == 0:
-                    end = i+1
-                    break
-    data = json5.loads("{" + dstr[:end] + "}")
-    return data.get(field)
+YY_CHUNK_SIZE = 16384
+# Bytes read from the end of .yy files, see `read_yy_parent`.
+YY_TAIL_SIZE = 4096
+# Linux ioctl to share the data blocks of a file (btrfs, xfs, ...).
+FICLONE = 0x40049409
+# Files being written, see `atomic_write`.
+TEMP_SUFFIX = ".gmdm-tmp"
+# Keys of .yy files that are never compared, see `yy_fingerprint`.
+YY_VOLATILE_KEYS = ("parent",)
+
+# GameMaker writes top-level keys indented by two spaces, nested ones deeper.
+_YY_PARENT_RE = re.compile(rb'\n  "parent":\s*(\{[^{}]*\})')
+_TRAILING_COMMA_RE = re.compile(rb',(\s*\})')
+
+
+class YYRef(NamedTuple):
+    """A resource reference as stored in .yy files: {"name", "path"}."""
+    name: str | None
+    path: str | None
+
+
+def _match_yy_parent(buf) -> YYRef | None:
+    match = _YY_PARENT_RE.search(buf)
+    if match is None:
+        return None
+    data = json.loads(_TRAILING_COMMA_RE.sub(rb"\1", match.group(1)))
+    return YYRef(data.get("name"), data.get("path"))
+
+
+def read_yy_parent(filepath, tail_size=YY_TAIL_SIZE) -> YYRef | None:
+    """Return the top-level "parent" reference of a .yy file.
+
+    GameMaker writes the field near the end of the file, after the frames
+    and sequence of sprites: only the last `tail_size` bytes are searched
+    first. Files not in GameMaker's layout are parsed in full instead.
+    """
+    profiling.count("files_read")
+    with open(filepath, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - tail_size))
+        buf = f.read()
+        ref = _match_yy_parent(buf)
+        if ref is None and size > tail_size:
+            f.seek(0)
+            buf = f.read()
+            ref = _match_yy_parent(buf)
+    if ref is not None:
+        return ref
+
+    data = parsing.loads(buf).get("parent")
+    if not isinstance(data, dict):
+        return None
+    return YYRef(data.get("name"), data.get("path"))
+
+
+def yy_fingerprint(filepath, exclude=YY_VOLATILE_KEYS) -> str:
+    """Return the hash of a .yy file without the excluded top-level keys.
+
+    The data is hashed as canonical JSON, so files that only differ by
+    those keys or by their layout have the same fingerprint.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = parsing.load(f)
+    for key in exclude:
+        data.pop(key, None)
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hash_file(filepath) -> str:
+    """Return the content hash of a file."""
+    profiling.count("files_read")
+    with open(filepath, "rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+def is_same_file(src, dst) -> bool:
+    """Return True if dst exists with the same content as src.
+
+    Equal size and mtime are trusted, equal sizes otherwise are compared
+    byte by byte.
+    """
+    try:
+        src_st = os.stat(src)
+        dst_st = os.stat(dst)
+    except OSError:
+        return False
+    if src_st.st_size != dst_st.st_size:
+        return False
+    if src_st.st_mtime_ns == dst_st.st_mtime_ns:
+        return True
+    profiling.count("filecmp_calls")
+    return filecmp.cmp(src, dst, shallow=False)
+
+
+def _clone_file(fsrc, fdst) -> bool:
+    if sys.platform != "linux":
+        return False
+    import fcntl
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(fsrc, fdst, size) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+            if n == 0:
+                break
+            copied += n
+    except OSError:
+        if copied:
+            raise
+        return False
+    return copied == size
+
+
+def temp_path(path) -> str:
+    head, tail = os.path.split(path)
+    return os.path.join(head, F".{tail}.{os.getpid()}{TEMP_SUFFIX}")
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", stat_from=None, **kwargs):
+    """Open a temporary file that replaces path once closed without error.
+
+    The file gets the metadata of `stat_from`, or the mode of the file it
+    replaces. An interrupted write leaves path as it was.
+    """
+    profiling.count("files_written")
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+        if stat_from is not None:
+            shutil.copystat(stat_from, tmp)
+        elif os.path.exists(path):
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def remove_temp_files(directory, recursive=True):
+    """Remove the files left in a directory tree by interrupted writes."""
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(TEMP_SUFFIX):
+                os.remove(os.path.join(root, name))
+        if not recursive:
+            break
+
+
+def copy_file(src, dst) -> int:
+    """Copy a file with its metadata like `shutil.copy2`.
+
+    A reflink or `os.copy_file_range` is used where the filesystem
+    supports it. The copy replaces dst atomically, see `atomic_write`.
+    Returns the number of bytes copied.
+    """
+    size = os.path.getsize(src)
+    with open(src, "rb") as fsrc, atomic_write(dst, "wb", stat_from=src) as fdst:
+        if not _clone_file(fsrc, fdst) and \
+                not _copy_file_range(fsrc, fdst, size):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst)
+    profiling.count("files_copied")
+    profiling.count("bytes_copied", size)
+    return size
+
+
+def fingerprint(path) -> str | None:
+    """Return a stat-based fingerprint of a file or a directory tree."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isdir(path):
+        return F"{st.st_size}:{st.st_mtime_ns}"
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(walk_files(path)):
+        st = os.stat(os.path.join(path, name))
+        h.update(F"{name}\0{st.st_size}:{st.st_mtime_ns}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def walk_files(directory):
+    """Yield the paths of all files under a directory, relative to it."""
+    for root, _, files in os.walk(directory):
+        rel = os.path.relpath(root, directory)
+        for name in files:
+            yield name if rel == "." else rel + "/" + name
 
 
 def yaml_loader():
@@ -62,77 +255,102 @@ def read_yaml(filepath):
     if not os.path.exists(filepath):
         raise FileNotFoundError(filepath)
 
-    with open(filepath, "r", encoding="utf-8") as stream:
+    with profiling.phase("read_yaml"), \
+            open(filepath, "r", encoding="utf-8") as stream:
         ymldic = yaml.load(stream, Loader=yaml_loader())
         return ymldic
 
 
-def compare_directories(left, right):
-    """Return -1 if left dir is newer than right, or 1, or 0.
-    This will compare each file to find the directory with newest file.
-    Using mtime and cmp.
+class DirectoryDiff(NamedTuple):
+    """How two directories differ, by the names of their files.
+
+    `newer` is -1 when the right side is newer, 1 when the left side is,
+    otherwise 0, see `compare_directories`. Of the files only on the left,
+    `created` are those known to be new there rather than deleted on the
+    right: only they are copied back.
     """
-    compared = 0
-    compared_left = -1000
-    compared_right = -1000
-    left_files = []
-    right_files = []
-    right_diff_files = []
-
-    for left_file in os.listdir(left):
-        left_files.append(
-            (left_file, os.path.getmtime(left + os.sep + left_file)))
-
-    for right_file in os.listdir(right):
-        if right_file not in [f[0] for f in left_files]:
-            right_diff_files.append(
-                (right_file, os.path.getmtime(right + os.sep + right_file)))
-        else:
-            right_files.append(
-                (right_file, os.path.getmtime(right + os.sep + right_file)))
-
-    if len(right_diff_files) > 0:
-        compared = -1
-
-    elif len(left_files) > len(right_files):
-        compared = 1
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+    newer: int
+    created: List[str] = []
 
-    else:
-        compared_left = 0
-        compared_right = 0
-
-        for right_set in right_files:
-            left_set = [f for f in left_files if f[0] == right_set[0]][0]
-
-            left_file = left + os.sep + left_set[0]
-            right_file = right + os.sep + right_set[0]
-
-            # If there's a renaming, exclude the field from comparison.
-            if left_file[-3:] == ".yy" and right_file[-3:] == ".yy":
-                if not filecmp.cmp(left_file, right_file):
-                    with open(left_file, "r", encoding="utf-8") as f:
-                        ljson = json5.load(f)
-                        del ljson["parent"]
-                    with open(right_file, "r", encoding="utf-8") as f:
-                        rjson = json5.load(f)
-                        del rjson["parent"]
-                    if ljson == rjson:
-                        continue
-
-            if filecmp.cmp(left_file, right_file):
+    def copied(self) -> List[str]:
+        """Return the files to copy from the newer side."""
+        if self.newer < 0:
+            return self.added + self.changed
+        if self.newer > 0:
+            return self.created + self.changed
+        return []
+
+    @classmethod
+    def from_hashes(cls, left: Dict[str, str], right: Dict[str, str], newer,
+                    last_left: Dict[str, str] | None = None):
+        """Diff {relative path: hash} of both sides, see `hash_directory`.
+
+        Files only on the left that were not there at the last sync,
+        `last_left`, were created since.
+        """
+        removed = [name for name in left if name not in right]
+        return cls([name for name in right if name not in left],
+                   removed,
+                   [name for name, h in left.items() if name in right and right[name] != h],
+                   newer,
+                   [name for name in removed if last_left is not None and name not in last_left])
+
+
+def _same_contents(left, right) -> bool:
+    profiling.count("filecmp_calls")
+    with open(left, "rb") as fl, open(right, "rb") as fr:
+        while True:
+            lchunk = fl.read(YY_CHUNK_SIZE)
+            if lchunk != fr.read(YY_CHUNK_SIZE):
+                return False
+            if not lchunk:
+                return True
+
+
+def _scan(directory) -> Dict[str, os.stat_result]:
+    with os.scandir(directory) as it:
+        return {entry.name: entry.stat() for entry in it}
+
+
+def compare_directories(left, right, fingerprint=yy_fingerprint) -> DirectoryDiff:
+    """Diff the entries of two directories, and tell which one is newer.
+
+    Files only on the right make it newer. Otherwise the side with the
+    newest changed file is newer: files only on the left may have been
+    deleted on the right, so they don't count and are not copied back.
+    Files with equal size and mtime are trusted to be equal, .yy files are
+    compared by `fingerprint`, and subdirectories always count as changed.
+    """
+    lstats = _scan(left)
+    rstats = _scan(right)
+    added = [name for name in rstats if name not in lstats]
+    removed = [name for name in lstats if name not in rstats]
+
+    changed = []
+    left_mtime = right_mtime = 0
+    for name, rst in rstats.items():
+        lst = lstats.get(name)
+        if lst is None:
+            continue
+        if stat.S_ISREG(lst.st_mode) and stat.S_ISREG(rst.st_mode):
+            if lst.st_size == rst.st_size and lst.st_mtime == rst.st_mtime:
                 continue
-            compared_left = max(left_set[1], compared_left)
-            compared_right = max(right_set[1], compared_right)
-            compared = True
-
-    if compared is not None:
-        if compared_left > compared_right:
-            compared = 1
-        if compared_left < compared_right:
-            compared = -1
-        if compared_left == compared_right:
-            compared = 0
-    else:
-        compared = 0
+            left_file = left + os.sep + name
+            right_file = right + os.sep + name
+            if lst.st_size == rst.st_size and _same_contents(left_file, right_file):
+                continue
+            # If there's a renaming, the parent differs.
+            if name.endswith(".yy") and fingerprint(left_file) == fingerprint(right_file):
+                continue
+        changed.append(name)
+        left_mtime = max(lst.st_mtime, left_mtime)
+        right_mtime = max(rst.st_mtime, right_mtime)
 
-    return -1 if compared < 0 else 1 if compared > 0 else 0
+    if added:
+        newer = -1
+    else:
+        newer = (left_mtime > right_mtime) - (left_mtime < right_mtime)
+    return DirectoryDiff(added, removed, changed, newer)
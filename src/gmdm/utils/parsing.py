@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Reading and writing GameMaker .yyp/.yy files.
+
+GameMaker writes JSON with trailing commas. Those are stripped and the
+text is handed to a C-accelerated JSON parser (`orjson` when installed,
+otherwise the standard library). Anything else falls back to `json5`.
+"""
+import json
+import re
+
+import json5
+
+from gmdm import profiling
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_TRAILING_COMMA_RE = re.compile(r',(?=\s*[\]}])')
+# Strings are matched first so that commas inside them are left alone.
+_STRING_OR_TRAILING_COMMA_RE = re.compile(
+    r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[\]}])')
+_CLOSING_LINE_RE = re.compile(r'\n( *)([\]}])')
+# Escapes that `json` and `json5` write differently.
+_JSON5_ESCAPES = ("\\u0000", "\\u000b", "\\u007f")
+
+
+def strip_trailing_commas(s: str) -> str:
+    """Remove trailing commas before `]` and `}` outside of strings."""
+    if '\\"' in s or "\0" in s:
+        return _STRING_OR_TRAILING_COMMA_RE.sub(r"\1\2", s)
+    # Without escaped quotes every other piece between quotes is outside
+    # of a string, those are joined and stripped in a single pass.
+    parts = s.split('"')
+    parts[::2] = _TRAILING_COMMA_RE.sub("", "\0".join(parts[::2])).split("\0")
+    return '"'.join(parts)
+
+
+def _fast_loads(s: str):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+def loads(s: str | bytes):
+    """Parse a GameMaker JSON document."""
+    if isinstance(s, (bytes, bytearray)):
+        s = s.decode("utf-8")
+    profiling.count("json_parses")
+    try:
+        return _fast_loads(strip_trailing_commas(s))
+    except ValueError:
+        return json5.loads(s)
+
+
+def load(fp):
+    """Parse a GameMaker JSON document from a file object."""
+    profiling.count("files_read")
+    return loads(fp.read())
+
+
+def dumps(obj, indent=2) -> str:
+    """Serialize the same way as `json5.dumps(obj, quote_keys=True, indent=2)`."""
+    s = json.dumps(obj, indent=indent)
+    if any(esc in s for esc in _JSON5_ESCAPES):
+        return json5.dumps(obj, quote_keys=True, indent=indent)
+    return _CLOSING_LINE_RE.sub(r",\n\1\2", s)
+
+
+def dumps_compact(obj, sort_keys=False) -> str:
+    """Serialize on one line, as GameMaker writes array entries.
+
+    {"id":{"name":"a","path":"b",},}
+    """
+    if isinstance(obj, dict):
+        keys = sorted(obj, key=str.lower) if sort_keys else obj
+        return "{" + "".join(json.dumps(k) + ":" + dumps_compact(obj[k], sort_keys) + ","
+                             for k in keys) + "}"
+    if isinstance(obj, list):
+        return "[" + "".join(dumps_compact(v, sort_keys) + "," for v in obj) + "]"
+    return json.dumps(obj)
+
+
+def dump(obj, fp):
+    """Serialize to a file object, see `dumps`."""
+    fp.write(dumps(obj))
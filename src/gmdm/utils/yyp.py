@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Patching the "Folders" and "resources" of a .yyp file in place.
+
+Only the entries that were added or removed are written, the rest of the
+text is kept as is. New entries follow the layout of the existing ones:
+one line per entry as GameMaker writes them, or indented blocks. They are
+inserted in GameMaker's order (by folder path, or by resource name) when
+the array is already sorted that way, and appended otherwise.
+"""
+import bisect
+import json
+import re
+from typing import Dict, List, Tuple
+
+from gmdm.utils import parsing
+from gmdm.utils.strings import name_from_path
+
+_TOP_LEVEL_INDENT_RE = re.compile(r'\{[ \t]*\r?\n( *)"')
+_STRING = r'"([^"\\]*(?:\\.[^"\\]*)*)"'
+KEYS = {
+    "Folders": re.compile(r'"folderPath"\s*:\s*' + _STRING),
+    "resources": re.compile(r'"path"\s*:\s*' + _STRING),
+}
+
+
+def entry_key(section, dic) -> str:
+    """Return the path identifying an entry of the section."""
+    if section == "Folders":
+        return dic["folderPath"]
+    return dic["id"]["path"]
+
+
+def sort_key(section, key) -> str:
+    if section == "Folders":
+        return key.lower()
+    return name_from_path(key).lower()
+
+
+def is_sorted(section, entries: List[dict]) -> bool:
+    """Return whether the entries are in GameMaker's order."""
+    order = [sort_key(section, entry_key(section, dic)) for dic in entries]
+    return all(a <= b for a, b in zip(order, order[1:]))
+
+
+def insert_entry(section, entries: List[dict], dic: dict, in_order: bool):
+    """Add the entry to the list where `patch_project` writes it in the text."""
+    if not in_order:
+        entries.append(dic)
+        return
+    key = lambda d: sort_key(section, entry_key(section, d))  # noqa: E731
+    entries.insert(bisect.bisect_right(entries, key(dic), key=key), dic)
+
+
+def _unescape(s):
+    return json.loads('"' + s + '"') if "\\" in s else s
+
+
+def _is_sorted_keys(obj) -> bool:
+    if isinstance(obj, dict):
+        return list(obj) == sorted(obj, key=str.lower) and \
+            all(_is_sorted_keys(v) for v in obj.values())
+    if isinstance(obj, list):
+        return all(_is_sorted_keys(v) for v in obj)
+    return True
+
+
+class _Array:
+    """The entries of a top-level array of the .yyp text."""
+
+    def __init__(self, text, section, indent, eol):
+        self.section = section
+        self.indent = indent
+        self.eol = eol
+        self.starts, self.keys = [], []
+        self.item_indent, self.one_line, self.sort_keys = None, True, True
+        match = re.search(r'\n' + indent + '"' + section + r'"\s*:\s*\[', text)
+        if match is None:
+            raise ValueError(F"No \"{section}\" array")
+        self.open = match.end()
+        # Empty on one line, "[]": the bracket is moved to its own line.
+        self.inline = text[self.open:].lstrip(" \t").startswith("]")
+        if self.inline:
+            self.close = text.index("]", self.open)
+            return
+        # Position of the "\n" before the closing bracket.
+        self.close = text.find("\n" + indent + "]", self.open)
+        if self.close < 0:
+            raise ValueError(F"The \"{section}\" array is not indented")
+
+        first = re.compile(r'\r?\n( +)\{').match(text, self.open)
+        if first is None:
+            if text[self.open:self.close].strip():
+                raise ValueError(F"Unexpected \"{section}\" entry")
+            return
+        self.item_indent = first.group(1)
+        start_re = re.compile(r'\n' + self.item_indent + r'\{')
+        self.starts = [m.start() for m in start_re.finditer(text, self.open, self.close)]
+        self.keys = [_unescape(m.group(1)) for m in
+                     KEYS[section].finditer(text, self.open, self.close)]
+        if len(self.keys) != len(self.starts) or len(set(self.keys)) != len(self.keys):
+            raise ValueError(F"Unexpected \"{section}\" entries")
+
+        end = self.starts[1] if len(self.starts) > 1 else self.close
+        entry = text[self.starts[0]:end].strip().rstrip(",")
+        self.one_line = "\n" not in entry
+        self.sort_keys = self.one_line and _is_sorted_keys(parsing.loads(entry))
+
+    def end_of(self, i):
+        return self.starts[i + 1] if i + 1 < len(self.starts) else self.close
+
+    def render(self, dic) -> str:
+        """Return the entry as inserted before the "\n" of a line."""
+        # With "\r\n" line ends, the "\r" of the previous line is kept.
+        tail = "," + self.eol[:-1]
+        if self.one_line:
+            return "\n" + self.item_indent + parsing.dumps_compact(dic, self.sort_keys) + tail
+        step = len(self.item_indent) - len(self.indent)
+        lines = parsing.dumps(dic, indent=step).split("\n")
+        return (self.eol[:-1] + "\n" + self.item_indent).join(
+            [""] + lines) + tail
+
+
+def patch_project(text: str, changes: Dict[str, Dict[str, dict | None]]) -> str:
+    """Return the .yyp text with the changes applied.
+
+    `changes` maps "Folders" and "resources" to {path: entry}, where the
+    entry replaces the one with that path, or removes it when None. Raises
+    ValueError when the text is not laid out as expected.
+    """
+    match = _TOP_LEVEL_INDENT_RE.match(text)
+    if match is None:
+        raise ValueError("The project is not indented")
+    eol = "\r\n" if match.group(0).endswith('\r\n' + match.group(1) + '"') else "\n"
+    arrays = {section: _Array(text, section, match.group(1), eol)
+              for section in changes}
+
+    # (position, end of the removed text, inserted text)
+    edits: List[Tuple[int, int, str]] = []
+    for section, entries in changes.items():
+        array = arrays[section]
+        if not entries:
+            continue
+        if array.item_indent is None:
+            # Empty: laid out like the other array, or as GameMaker does.
+            other = [a for a in arrays.values() if a is not array and a.item_indent]
+            array.item_indent = other[0].item_indent if other else array.indent * 2
+            if other:
+                array.one_line, array.sort_keys = other[0].one_line, other[0].sort_keys
+
+        index = {key: i for i, key in enumerate(array.keys)}
+        for key, dic in entries.items():
+            if key in index:
+                i = index[key]
+                edits.append((array.starts[i], array.end_of(i), ""))
+
+        order = [sort_key(section, k) for k in array.keys]
+        is_sorted = all(a <= b for a, b in zip(order, order[1:]))
+        added = [dic for dic in entries.values() if dic is not None]
+        if is_sorted:
+            added.sort(key=lambda d: sort_key(section, entry_key(section, d)))
+        for dic in added:
+            i = bisect.bisect_right(order, sort_key(section, entry_key(section, dic))) \
+                if is_sorted else len(order)
+            pos = array.starts[i] if i < len(array.starts) else array.close
+            edits.append((pos, pos, array.render(dic)))
+
+        if array.inline and added:
+            edits.insert(0, (array.open, array.close, eol[:-1]))
+            edits.append((array.close, array.close, "\n" + array.indent))
+
+    # Stable sort: removals before insertions at the same position, and
+    # the text of a removal is not written again by an insertion after it.
+    edits.sort(key=lambda e: e[0])
+    parts, last = [], 0
+    for pos, end, insert in edits:
+        parts.append(text[last:pos])
+        parts.append(insert)
+        last = max(last, end)
+    parts.append(text[last:])
+    return "".join(parts)
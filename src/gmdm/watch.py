@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""File system watchers for `gmdm watch`."""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterator, Set
+
+from gmdm.utils.files import walk_files
+
+logger = logging.getLogger("GmDm")
+
+# inotify(7)
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Detect changes by comparing stat snapshots of the watched paths."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._roots: Dict[str, bool] = {}
+        self._snapshot: Dict[str, tuple] = {}
+
+    def add(self, path, recursive=True):
+        path = os.path.abspath(path)
+        self._roots[path] = recursive
+        self._snapshot.update(self._scan(path, recursive))
+
+    def _scan(self, root, recursive):
+        snapshot = {}
+        if recursive:
+            names = (os.path.join(root, n) for n in walk_files(root))
+        else:
+            try:
+                names = (e.path for e in os.scandir(root) if e.is_file())
+            except OSError:
+                names = ()
+        for path in names:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float | None) -> Set[str]:
+        """Wait up to timeout seconds (forever if None) for changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = {}
+            for root, recursive in self._roots.items():
+                snapshot.update(self._scan(root, recursive))
+            changed = {p for p in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(p) != self._snapshot.get(p)}
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watcher, directories are watched recursively."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, str] = {}
+        self._recursive: Dict[int, bool] = {}
+
+    def add(self, path, recursive=True):
+        path = os.path.abspath(path)
+        wd = self._add_watch(self._fd, os.fsencode(path), IN_MASK)
+        if wd < 0:
+            logger.warning(F"Cannot watch \"{path}\": {os.strerror(ctypes.get_errno())}")
+            return
+        self._watches[wd] = path
+        self._recursive[wd] = recursive
+        if recursive:
+            for entry in os.scandir(path):
+                if entry.is_dir(follow_symlinks=False):
+                    self.add(entry.path)
+
+    def poll(self, timeout: float | None) -> Set[str]:
+        """Wait up to timeout seconds (forever if None) for changed paths."""
+        changed = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length]
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, report every watched directory.
+                    changed.update(self._watches.values())
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                root = self._watches.get(wd)
+                if root is None:
+                    continue
+                path = root
+                if name.rstrip(b"\0"):
+                    path = os.path.join(root, os.fsdecode(name.rstrip(b"\0")))
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) \
+                        and self._recursive.get(wd):
+                    self.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def get_watcher(polling=False, interval=1.0):
+    """Return an inotify watcher where available, a polling one otherwise."""
+    if not polling and sys.platform == "linux":
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            logger.debug(F"inotify is not available: {e}")
+    return PollingWatcher(interval)
+
+
+def debounced(watcher, quiet=0.5) -> Iterator[Set[str]]:
+    """Yield sets of changed paths, once no change came for quiet seconds."""
+    while True:
+        changed = watcher.poll(None)
+        while changed:
+            more = watcher.poll(quiet)
+            if not more:
+                break
+            changed |= more
+        if changed:
+            yield changed
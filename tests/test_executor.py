@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from gmdm.executor import operation_dependencies
+from gmdm.ops import (AddAssetOperation, CopyDirectoryOperation,
+                      ProjectSaveOperation)
+
+
+def test_save_waits_for_every_operation():
+    project = SimpleNamespace(path="Main/Main.yyp")
+    ops = [
+        AddAssetOperation(project, "spr_a"),
+        CopyDirectoryOperation("Core/sprites/spr_a", "Main/sprites/spr_a"),
+        CopyDirectoryOperation("Core/sprites/spr_b", "Main/sprites/spr_b"),
+        ProjectSaveOperation(project),
+    ]
+    assert operation_dependencies(ops)[-1] == {0, 1, 2}
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import os
+
+from gmdm.utils.files import DirectoryDiff, YYRef, compare_directories, read_yy_parent
+
+PARENT = '  "parent":{"name":"Sprites","path":"folders/Sprites.yy",},\n'
+
+
+def write_yy(tmp_path, before, after=""):
+    path = tmp_path / "spr.yy"
+    path.write_text("{\n" + before + PARENT + after + '  "name":"spr",\n}', "utf-8")
+    return str(path)
+
+
+def test_parent_at_the_end(tmp_path):
+    frames = '  "frames":[\n' + '    {"parent":{"name":"spr","path":"x.yy",},},\n' * 500 + '  ],\n'
+    path = write_yy(tmp_path, frames)
+    assert read_yy_parent(path, tail_size=256) == YYRef("Sprites", "folders/Sprites.yy")
+
+
+def test_parent_before_the_tail(tmp_path):
+    frames = '  "frames":[\n' + '    {"name":"f",},\n' * 500 + '  ],\n'
+    path = write_yy(tmp_path, "", frames)
+    assert read_yy_parent(path, tail_size=256) == YYRef("Sprites", "folders/Sprites.yy")
+
+
+def test_parent_in_another_layout(tmp_path):
+    path = tmp_path / "spr.yy"
+    path.write_text('{"name": "spr", "parent": {"name": "A", "path": "folders/A.yy"}}', "utf-8")
+    assert read_yy_parent(str(path)) == YYRef("A", "folders/A.yy")
+
+
+def make_dir(path, files, mtime):
+    path.mkdir()
+    for name, content in files.items():
+        (path / name).write_bytes(content)
+        os.utime(path / name, (mtime, mtime))
+    return str(path)
+
+
+def test_files_deleted_upstream_are_not_copied_back(tmp_path):
+    # The source deleted f2.png and updated f1.png since the last sync.
+    local = make_dir(tmp_path / "local", {"f1.png": b"old", "f2.png": b"2"}, 1000)
+    source = make_dir(tmp_path / "source", {"f1.png": b"new"}, 2000)
+
+    diff = compare_directories(local, source)
+    assert diff.removed == ["f2.png"]
+    assert diff.newer == -1
+    assert diff.copied() == ["f1.png"]
+
+
+def test_files_only_local_do_not_make_it_newer(tmp_path):
+    local = make_dir(tmp_path / "local", {"f1.png": b"1", "f2.png": b"2"}, 1000)
+    source = make_dir(tmp_path / "source", {"f1.png": b"1"}, 1000)
+
+    diff = compare_directories(local, source)
+    assert diff.newer == 0
+    assert diff.copied() == []
+
+
+def test_files_created_locally_are_copied_back():
+    last_local = {"f1.png": "a", "f2.png": "b"}
+    diff = DirectoryDiff.from_hashes({"f1.png": "c", "f2.png": "b", "f3.png": "d"},
+                                     {"f1.png": "a"}, 1, last_local)
+    # f2.png was deleted upstream before the last sync, f3.png is new.
+    assert sorted(diff.copied()) == ["f1.png", "f3.png"]
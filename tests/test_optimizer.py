@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from gmdm.ops import (AddAssetOperation, CopyDirectoryOperation,
+                      ProjectSaveOperation)
+from gmdm.optimizer import drop_superseded_copies, merge_saves
+
+
+def test_project_is_saved_once_at_the_end():
+    project = SimpleNamespace(path="Main/Main.yyp")
+    ops = [
+        AddAssetOperation(project, "spr_a"),
+        ProjectSaveOperation(project),
+        CopyDirectoryOperation("Core/sprites/spr_a", "Main/sprites/spr_a"),
+        AddAssetOperation(project, "spr_b"),
+        CopyDirectoryOperation("Core/sprites/spr_b", "Main/sprites/spr_b"),
+    ]
+    merged = merge_saves(ops)
+
+    assert merged[:-1] == [op for op in ops if not isinstance(op, ProjectSaveOperation)]
+    assert isinstance(merged[-1], ProjectSaveOperation)
+    assert merged[-1].project is project
+
+
+def test_copies_back_and_forth_are_kept():
+    ops = [
+        CopyDirectoryOperation("A", "B"),
+        CopyDirectoryOperation("B", "A"),
+        CopyDirectoryOperation("A", "B"),
+    ]
+    assert drop_superseded_copies(list(ops)) == ops
+
+
+def test_repeated_copy_is_dropped():
+    first = CopyDirectoryOperation("A", "B", files=["f1.png"])
+    second = CopyDirectoryOperation("A", "B", files=["f2.png"])
+    other = CopyDirectoryOperation("C", "D")
+
+    assert drop_superseded_copies([first, other, second]) == [other, second]
+    assert second.files == ["f1.png", "f2.png"]
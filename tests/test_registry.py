@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import os
+
+from gmdm.registry import ImportResolver
+
+
+def make_dirs(tmp_path, *names):
+    for name in names:
+        (tmp_path / name).mkdir(parents=True)
+
+
+def test_relative_import(tmp_path):
+    make_dirs(tmp_path, "Main", "Core")
+    resolver = ImportResolver(dirs=[""], base=str(tmp_path / "Main"))
+
+    assert resolver.resolve("../Core") == os.path.join(str(tmp_path / "Main"), "../Core")
+    assert resolver.resolve("../Missing") is None
+    # Both are looked up in the listing of the parent directory.
+    assert list(resolver._listings) == [str(tmp_path)]
+
+
+def test_relative_import_from_import_dirs(tmp_path):
+    make_dirs(tmp_path, "Main", "libs/games", "libs/Core")
+    games = str(tmp_path / "libs" / "games")
+    resolver = ImportResolver(dirs=["", games], base=str(tmp_path / "Main"))
+
+    assert resolver.resolve("../Core") == games + os.sep + "../Core"
+    assert str(tmp_path / "libs") in resolver._listings
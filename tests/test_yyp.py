@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from gmdm.models import YYAsset, YYFolder, YYProject
+from gmdm.utils import parsing
+
+
+def write_project(directory, resources, folders=(), eol="\n"):
+    lines = ['{', '  "$GMProject":"",', '  "%Name":"P",', '  "Folders":[']
+    lines += [F'    {{"$GMFolder":"","%Name":"{f}","folderPath":"folders/{f}.yy","name":"{f}",}},'
+              for f in folders]
+    lines += ['  ],', '  "name":"P",', '  "resources":[']
+    lines += [F'    {{"id":{{"name":"{r}","path":"sprites/{r}/{r}.yy",}},}},' for r in resources]
+    lines += ['  ],', '  "resourceType":"GMProject",', '}', '']
+    path = directory / "P.yyp"
+    path.write_bytes(eol.join(lines).encode("utf-8"))
+    return path
+
+
+def resource_names(path):
+    return [r["id"]["name"] for r in parsing.loads(path.read_text("utf-8"))["resources"]]
+
+
+def test_insert_into_the_slot_of_a_removed_entry(tmp_path):
+    path = write_project(tmp_path, ["spr_a", "spr_z"])
+    project = YYProject(str(path))
+    project.remove_yyasset(YYAsset("sprites/spr_z/spr_z.yy", project))
+    project.add_yyasset(YYAsset("sprites/spr_b/spr_b.yy", project))
+    project.save()
+
+    assert resource_names(path) == ["spr_a", "spr_b"]
+    assert parsing.loads(path.read_text("utf-8")) == project._data
+
+
+def test_patched_text_matches_the_data(tmp_path):
+    path = write_project(tmp_path, ["spr_b", "spr_d", "spr_f"], ["A", "C"])
+    project = YYProject(str(path))
+    project.add_yyfolder(YYFolder("folders/B.yy"))
+    project.add_yyfolder(YYFolder("folders/D.yy"))
+    project.remove_yyfolder(YYFolder("folders/A.yy"))
+    project.remove_yyasset(YYAsset("sprites/spr_d/spr_d.yy", project))
+    for name in ("spr_a", "spr_d", "spr_e", "spr_g"):
+        project.add_yyasset(YYAsset(F"sprites/{name}/{name}.yy", project))
+    project.save()
+
+    assert parsing.loads(path.read_text("utf-8")) == project._data
+    assert resource_names(path) == ["spr_a", "spr_b", "spr_d", "spr_e", "spr_f", "spr_g"]
+
+
+def test_unsorted_entries_are_appended(tmp_path):
+    path = write_project(tmp_path, ["spr_c", "spr_a"])
+    project = YYProject(str(path))
+    project.add_yyasset(YYAsset("sprites/spr_b/spr_b.yy", project))
+    project.save()
+
+    assert resource_names(path) == ["spr_c", "spr_a", "spr_b"]
+    assert parsing.loads(path.read_text("utf-8")) == project._data
+
+
+def test_full_dump_keeps_crlf(tmp_path):
+    path = write_project(tmp_path, ["spr_a"], eol="\r\n")
+    project = YYProject(str(path))
+    project.add_yyasset(YYAsset("sprites/spr_b/spr_b.yy", project))
+    # As if the file changed since it was read.
+    project._stat = None
+    project.save()
+
+    data = path.read_bytes()
+    assert data.count(b"\n") == data.count(b"\r\n") > 1
+    assert resource_names(path) == ["spr_a", "spr_b"]